@@ -0,0 +1,115 @@
+"""
+Per-question grading analytics kept as running aggregates.
+Every stored or overwritten grade adjusts counts, sums, sums of squares,
+a fixed-bucket histogram and feedback-band counts for each of its
+questions, so a query never scans submissions.
+"""
+
+import math
+import threading
+
+from _grading import FEEDBACK_MESSAGES, FEEDBACK_THRESHOLDS, feedback_band
+
+# Histogram buckets over the score as a percentage of max points:
+# [0, 10), [10, 20), ... [90, 100]
+HISTOGRAM_BUCKETS = 10
+
+
+def _bucket(score, max_points):
+    return min(int(score / max_points * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1) if max_points else 0
+
+
+class _QuestionStats:
+    __slots__ = ('max_points', 'count', 'total', 'total_sq', 'histogram', 'bands')
+
+    def __init__(self, max_points):
+        self.max_points = max_points
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        self.bands = [0] * len(FEEDBACK_MESSAGES)
+
+    def add(self, score, sign):
+        self.count += sign
+        self.total += sign * score
+        self.total_sq += sign * score * score
+        self.histogram[_bucket(score, self.max_points)] += sign
+        if self.max_points:
+            self.bands[feedback_band(score, self.max_points)] += sign
+
+    def to_dict(self, question_id):
+        count = self.count
+        mean = self.total / count if count else None
+        # Subtracting overwritten grades can leave rounding noise below zero
+        variance = max(self.total_sq / count - mean * mean, 0.0) if count else None
+        bounds = [0] + list(FEEDBACK_THRESHOLDS) + [None]
+        return {
+            "question_id": question_id,
+            "max_points": self.max_points,
+            "count": count,
+            "mean": None if mean is None else round(mean, 3),
+            "stddev": None if variance is None else round(math.sqrt(variance), 3),
+            "mean_percentage": round(mean / self.max_points * 100, 1) if count and self.max_points else None,
+            "histogram": [
+                {"from_percentage": i * 100 // HISTOGRAM_BUCKETS,
+                 "to_percentage": (i + 1) * 100 // HISTOGRAM_BUCKETS,
+                 "count": n}
+                for i, n in enumerate(self.histogram)
+            ],
+            "feedback_bands": [
+                {"feedback": message,
+                 "from_percentage": bounds[i],
+                 "to_percentage": bounds[i + 1],
+                 "count": n,
+                 "share": round(n / count, 4) if count else 0.0}
+                for i, (message, n) in enumerate(zip(FEEDBACK_MESSAGES, self.bands))
+            ],
+        }
+
+
+class GradingAnalytics:
+    """Running score aggregates per (assignment type, question).
+
+    Register with store.add_grade_listener(analytics.update); the store
+    replays existing grades and then reports every change. Questions of
+    the given rubrics are listed, in rubric order, before any are graded.
+    """
+
+    def __init__(self, rubrics=None):
+        self._lock = threading.Lock()
+        # assignment type -> {question id: _QuestionStats}
+        self._questions = {}
+        # assignment type -> number of graded submissions
+        self._graded = {}
+        for assignment_type, rubric in (rubrics or {}).items():
+            self._questions[assignment_type] = {
+                q['id']: _QuestionStats(q['max_points']) for q in rubric['questions']
+            }
+
+    def update(self, assignment_type, old_scores, new_scores):
+        """Replace one submission's old (question id, max points, score)
+        triples with its new ones"""
+        with self._lock:
+            questions = self._questions.setdefault(assignment_type, {})
+            for scores, sign in ((old_scores, -1), (new_scores, 1)):
+                for question_id, max_points, score in scores:
+                    stats = questions.get(question_id)
+                    if stats is None:
+                        stats = questions[question_id] = _QuestionStats(max_points)
+                    stats.add(score, sign)
+            self._graded[assignment_type] = (self._graded.get(assignment_type, 0)
+                                             + bool(new_scores) - bool(old_scores))
+
+    def summary(self, assignment_type=None):
+        """Aggregates for one assignment type, or all of them"""
+        with self._lock:
+            types = [assignment_type] if assignment_type is not None else sorted(self._questions)
+            return {
+                name: {
+                    "graded_submissions": self._graded.get(name, 0),
+                    "questions": [stats.to_dict(question_id)
+                                  for question_id, stats in self._questions.get(name, {}).items()],
+                }
+                for name in types
+            }
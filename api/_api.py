@@ -0,0 +1,254 @@
+"""
+Request handling for the grading API, shared by the Vercel function
+(api/grade.py) and the local development server (local_server.py).
+"""
+
+import json
+import time
+from urllib.parse import parse_qs
+
+from _cache import send_cached, send_entry, send_not_modified, send_streamed
+from _export import parse_export_query, stream_gradebook
+from _grading import batch_seed, grading_result, select_batch
+from _http import PREFLIGHT_HEADERS, send_body, send_error_json, send_json
+from _import import import_submissions
+from _jobs import QueueFull, job_links, stream_job_events, wants_async
+from _metrics import METRICS_HEADERS
+from _routes import Router
+from _serialize import CACHED_LISTING_ROWS, iter_changes, iter_listing, parse_listing_query, read_json_body
+
+ROUTES = Router()
+
+
+class GradingAPI:
+    """Routes requests from a BaseHTTPRequestHandler to the store, response
+    cache, job queue and grader it was built with, and records each request
+    in metrics. Imported submissions are validated against rubrics, and
+    analytics holds the running score aggregates."""
+
+    def __init__(self, store, cache, jobs, grader, metrics, rubrics, analytics):
+        self.store = store
+        self.cache = cache
+        self.jobs = jobs
+        self.grader = grader
+        self.metrics = metrics
+        self.rubrics = rubrics
+        self.analytics = analytics
+
+    def dispatch(self, handler):
+        """Answer the request held by handler.
+
+        The handler's log_request is expected to leave the status and body
+        size in response_status and response_size; a request that raises
+        before responding is counted as a 500.
+        """
+        start = time.perf_counter()
+        handler.response_status = 500
+        handler.response_size = 0
+        path, _, query = handler.path.partition('?')
+        template = '*'
+        try:
+            if handler.command == 'OPTIONS':
+                send_body(handler, 200, header_block=PREFLIGHT_HEADERS)
+                return
+            route, params = ROUTES.match(handler.command, path)
+            if route is None:
+                template = 'unmatched'
+                send_error_json(handler, 404, "Not found")
+                return
+            template = ROUTES.templates[route]
+            route(self, handler, query, **params)
+        finally:
+            self.metrics.observe_request(handler.command, template, handler.response_status,
+                                         time.perf_counter() - start, handler.response_size)
+
+    @ROUTES.route('GET', '/api/submissions')
+    def list_submissions(self, handler, query):
+        # GET /api/submissions[?status=...&limit=...&cursor=...&fields=...&since=...]
+        try:
+            listing = parse_listing_query(parse_qs(query))
+        except ValueError as e:
+            send_error_json(handler, 400, str(e))
+            return
+
+        key = ('list', query)
+        version = self._listing_version(listing)
+        if send_not_modified(handler, version):
+            return
+        entry = self.cache.peek(key, version)
+        if entry is None:
+            with self.store.lock:
+                version = self._listing_version(listing)
+                if listing.since is not None:
+                    position = self.store.feed_position()
+                    epoch, since = listing.since
+                    # Versions from another epoch count from somewhere else
+                    changes = self.store.changed_since(since, **listing.filters) if epoch == position[0] else None
+                    rows = changes[0] if changes else []
+                    chunks = iter_changes(changes, listing, position)
+                else:
+                    rows, next_cursor = self.store.page(
+                        after=listing.after, limit=listing.limit, **listing.filters
+                    )
+                    chunks = iter_listing(rows, listing, next_cursor)
+                if len(rows) <= CACHED_LISTING_ROWS:
+                    body = b''.join(chunks)
+            if len(rows) > CACHED_LISTING_ROWS:
+                # Too large to hold whole: write it as it is encoded
+                send_streamed(handler, version, chunks, self.store.lock)
+                return
+            entry = self.cache.put(key, version, body)
+        send_entry(handler, entry)
+
+    @ROUTES.route('GET', '/api/submissions/{id}')
+    def get_submission(self, handler, query, id):
+        submission = self.store.get(id)
+        if not submission:
+            send_error_json(handler, 404, "Submission not found")
+            return
+
+        def build():
+            with self.store.lock:
+                return json.dumps(submission.to_dict()).encode()
+
+        send_cached(self.cache, handler, ('submission', id), self.store.version_of(id), build)
+
+    @ROUTES.route('POST', '/api/submissions/grade-batch')
+    def grade_submissions(self, handler, query):
+        try:
+            body = read_json_body(handler)
+            submissions, missing = select_batch(self.store, body)
+            seed = batch_seed(body)
+        except ValueError as e:
+            send_error_json(handler, 400, str(e))
+            return
+
+        if body.get('async') or wants_async(query):
+            self._queue_grading(handler, submissions, seed=seed)
+            return
+
+        if seed is not None:
+            # Seeded batches are reproducible draws, not cached grades
+            results = self.grader.grade_batch(submissions, seed)
+        else:
+            results = [grading_result(s, self.grader.grade(s['assignment_type'], s['questions']))
+                       for s in submissions]
+        for result in results:
+            self._store_result(result)
+        send_json(handler, 200, {"results": results, "not_found": missing})
+
+    @ROUTES.route('POST', '/api/submissions/import')
+    def bulk_import(self, handler, query):
+        # Newline-delimited JSON, one submission per line
+        length = handler.headers.get('Content-Length')
+        if length is None:
+            send_error_json(handler, 411, "Content-Length required")
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            send_error_json(handler, 400, "Invalid Content-Length")
+            return
+        summary = import_submissions(self.store, handler.rfile, length, self.rubrics)
+        send_json(handler, 200, summary)
+
+    @ROUTES.route('POST', '/api/submissions/{id}/grade')
+    def grade_submission(self, handler, query, id):
+        submission = self.store.get(id)
+        if not submission:
+            send_error_json(handler, 404, "Submission not found")
+            return
+        if wants_async(query):
+            self._queue_grading(handler, [submission])
+            return
+
+        result = grading_result(submission, self.grader.grade(submission['assignment_type'], submission['questions']))
+        self._store_result(result)
+        send_json(handler, 200, result)
+
+    @ROUTES.route('POST', '/api/submissions/{id}/release')
+    def release_submission(self, handler, query, id):
+        if not self.store.set_status(id, 'released'):
+            send_error_json(handler, 404, "Submission not found")
+            return
+        send_json(handler, 200, {"message": "Grades released successfully"})
+
+    @ROUTES.route('GET', '/api/gradebook/export')
+    def export_gradebook(self, handler, query):
+        # GET /api/gradebook/export?format=csv|ndjson[&assignment_type=...&status=...]
+        try:
+            export_format, filters = parse_export_query(parse_qs(query), self.rubrics)
+        except ValueError as e:
+            send_error_json(handler, 400, str(e))
+            return
+        stream_gradebook(handler, self.store, self.rubrics, export_format, filters)
+
+    @ROUTES.route('GET', '/api/analytics')
+    def get_analytics(self, handler, query):
+        # GET /api/analytics[?assignment_type=...]
+        assignment_type = parse_qs(query).get('assignment_type', [None])[0]
+        if assignment_type is not None and assignment_type not in self.rubrics:
+            send_error_json(handler, 400, f"Unknown assignment_type: {assignment_type}")
+            return
+        # A lazily loaded store reports its existing grades as it loads
+        len(self.store)
+        send_json(handler, 200, self.analytics.summary(assignment_type))
+
+    @ROUTES.route('GET', '/api/jobs/{id}')
+    def get_job(self, handler, query, id):
+        job = self.jobs.get(id)
+        if not job:
+            send_error_json(handler, 404, "Job not found")
+            return
+        send_json(handler, 200, job.to_dict())
+
+    @ROUTES.route('GET', '/api/jobs/{id}/events')
+    def job_events(self, handler, query, id):
+        job = self.jobs.get(id)
+        if not job:
+            send_error_json(handler, 404, "Job not found")
+            return
+        stream_job_events(handler, job)
+
+    @ROUTES.route('GET', '/api/grading/cache')
+    def grading_cache_stats(self, handler, query):
+        send_json(handler, 200, self.grader.stats())
+
+    @ROUTES.route('GET', '/api/metrics')
+    def get_metrics(self, handler, query):
+        cache = self.grader.stats()
+        body = self.metrics.render((
+            ('grading_cache_hits_total', 'counter', 'Grading cache hits.', cache['hits']),
+            ('grading_cache_misses_total', 'counter', 'Grading cache misses.', cache['misses']),
+            ('grading_cache_evictions_total', 'counter', 'Grading cache evictions.', cache['evictions']),
+            ('grading_cache_entries', 'gauge', 'Grades held in the grading cache.', cache['size']),
+            ('grading_submissions', 'gauge', 'Submissions in the store.', len(self.store)),
+            ('grading_jobs_pending', 'gauge', 'Grading jobs waiting for a worker.', self.jobs.pending()),
+        ))
+        send_body(handler, 200, body.encode(), METRICS_HEADERS)
+
+    def _listing_version(self, listing):
+        """Version a listing response is cached and tagged at"""
+        if listing.since is None:
+            return self.store.version
+        # A change feed response also carries the feed position, which a
+        # shared store moves when its commit lands rather than on the change
+        return f'{self.store.version}-{self.store.feed_position()[1]}'
+
+    def _store_result(self, result):
+        # Update submission status and store grading results
+        self.store.record_grade(result['submission_id'], result)
+
+    def _queue_grading(self, handler, submissions, seed=None):
+        """Queue submissions for background grading and answer 202 with the job"""
+        try:
+            job = self.jobs.submit(submissions, self._store_result, seed=seed)
+        except QueueFull as e:
+            send_error_json(handler, 503, str(e), [('Retry-After', '1')])
+            return
+        send_json(handler, 202, job_links(job), [('Location', f"/api/jobs/{job.id}")])
+
+
+ROUTES.compile()
@@ -0,0 +1,123 @@
+"""
+Cache of pre-encoded JSON responses with version-based ETags.
+Entries are rebuilt only when the store version they were encoded at
+changes, i.e. when grading results are stored or a status changes.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from _http import CORS, JSON_HEADERS, Stream, send_body
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'version'])
+
+# Distinguishes ETags issued by different processes, since every cold start
+# begins counting versions from the same initial data
+_EPOCH = os.urandom(4).hex()
+
+
+def make_etag(version):
+    return f'"{_EPOCH}-{version}"'
+
+
+class ResponseCache:
+    """LRU map of cache key -> CachedResponse, bounded by entry count and
+    total body size. Bodies larger than a quarter of max_bytes are served
+    but not retained."""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Return the cached response for key, calling build() for the
+        encoded body if it is missing or was cached at another version"""
+        entry = self.peek(key, version)
+        if entry is None:
+            entry = self.put(key, version, build())
+        return entry
+
+    def peek(self, key, version):
+        """The cached response for key if it was cached at version, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                return entry
+        return None
+
+    def put(self, key, version, body):
+        """Cache body as key's response at version and return the entry"""
+        entry = CachedResponse(body, make_etag(version), version)
+        if len(entry.body) > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def send_not_modified(handler, version):
+    """Send a bodyless 304 if the request's If-None-Match covers version;
+    returns whether it did"""
+    etag = make_etag(version)
+    if not etag_matches(handler.headers.get('If-None-Match'), etag):
+        return False
+    send_body(handler, 304, header_block=CORS, headers=[('ETag', etag)])
+    return True
+
+
+def send_entry(handler, entry):
+    send_body(handler, 200, entry.body, JSON_HEADERS, [('ETag', entry.etag), ('Cache-Control', 'no-cache')])
+
+
+def send_streamed(handler, version, chunks, lock):
+    """Stream a JSON body that is too large to cache, taking `lock` while
+    each chunk is encoded but not while it is written"""
+    stream = Stream(handler, 200, JSON_HEADERS, [('ETag', make_etag(version)), ('Cache-Control', 'no-cache')])
+    while True:
+        with lock:
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        stream.write(chunk)
+    stream.close()
+
+
+def send_cached(cache, handler, key, version, build):
+    """Answer a GET from the response cache. Clients whose If-None-Match
+    covers the current version get a bodyless 304 without touching the
+    cache at all."""
+    if send_not_modified(handler, version):
+        return
+    send_entry(handler, cache.get(key, version, build))
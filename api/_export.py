@@ -0,0 +1,109 @@
+"""
+Gradebook export: one row per submission with per-question scores, as CSV
+or newline-delimited JSON. Rows are read from the store a page at a time
+and streamed with chunked transfer encoding, so memory use doesn't grow
+with the size of the gradebook.
+"""
+
+import io
+import json
+
+from _http import CORS, Stream
+from _store import INDEXED_FIELDS
+
+# Submissions read from the store (under its lock) and written per chunk
+EXPORT_PAGE_ROWS = 500
+
+EXPORT_FORMATS = {
+    'csv': (b'Content-Type: text/csv; charset=utf-8\r\n' + CORS, 'gradebook.csv'),
+    'ndjson': (b'Content-Type: application/x-ndjson\r\n' + CORS, 'gradebook.ndjson'),
+}
+
+COLUMNS = ('submission_id', 'student_name', 'student_id', 'assignment_type', 'status',
+           'total_score', 'max_total', 'percentage', 'graded_at')
+
+
+def parse_export_query(query, rubrics):
+    """(format, filters) from parse_qs output; raises ValueError on bad input"""
+    export_format = query.get('format', ['csv'])[0]
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    filters = {field: query[field][0] for field in INDEXED_FIELDS if field in query}
+    if 'assignment_type' in filters and filters['assignment_type'] not in rubrics:
+        raise ValueError(f"Unknown assignment_type: {filters['assignment_type']}")
+    return export_format, filters
+
+
+def question_columns(rubrics, assignment_type=None):
+    """Question ids that get a score column, in rubric order"""
+    if assignment_type is not None:
+        return [q['id'] for q in rubrics[assignment_type]['questions']]
+    ids = []
+    for rubric in rubrics.values():
+        for question in rubric['questions']:
+            if question['id'] not in ids:
+                ids.append(question['id'])
+    return ids
+
+
+def gradebook_row(submission):
+    """The exported fields of one submission; scores map question id to
+    score, or None before grading"""
+    return {
+        "submission_id": submission.get('id'),
+        "student_name": submission.get('student_name'),
+        "student_id": submission.get('student_id'),
+        "assignment_type": submission.get('assignment_type'),
+        "status": submission.get('status'),
+        "total_score": submission.get('total_score'),
+        "max_total": submission.get('max_total'),
+        "percentage": submission.get('percentage'),
+        "graded_at": submission.get('graded_at'),
+        "scores": dict(submission.question_scores()),
+    }
+
+
+def iter_gradebook(store, filters, page_rows=EXPORT_PAGE_ROWS):
+    """Yield lists of gradebook rows, one store page at a time"""
+    after = None
+    while True:
+        with store.lock:
+            submissions, after = store.page(after=after, limit=page_rows, **filters)
+            rows = [gradebook_row(submission) for submission in submissions]
+        if rows:
+            yield rows
+        if after is None:
+            return
+
+
+def _csv_chunk(writer, buffer, rows):
+    writer.writerows(rows)
+    data = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def stream_gradebook(handler, store, rubrics, export_format, filters):
+    """Write the gradebook for the filtered submissions as a streamed response"""
+    header_block, filename = EXPORT_FORMATS[export_format]
+    stream = Stream(handler, 200, header_block,
+                    [('Content-Disposition', f'attachment; filename="{filename}"')])
+
+    if export_format == 'csv':
+        # Only exports need the csv module; keep it off the cold-start path
+        import csv
+        questions = question_columns(rubrics, filters.get('assignment_type'))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        stream.write(_csv_chunk(writer, buffer, [list(COLUMNS) + [f"{q}_score" for q in questions]]))
+        stream.flush()
+        for rows in iter_gradebook(store, filters):
+            stream.write(_csv_chunk(writer, buffer, (
+                [row[column] for column in COLUMNS] + [row['scores'].get(q) for q in questions]
+                for row in rows
+            )))
+    else:
+        for rows in iter_gradebook(store, filters):
+            stream.write(''.join(json.dumps(row) + '\n' for row in rows).encode())
+    stream.close()
@@ -0,0 +1,314 @@
+"""
+Simulated AI grading, per submission and in batches
+"""
+
+import hashlib
+import random
+import threading
+import time
+import unicodedata
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Score percentage thresholds and the feedback for each band between them
+FEEDBACK_THRESHOLDS = (60, 70, 80, 90)
+FEEDBACK_MESSAGES = (
+    "Needs significant improvement. Review the concepts.",
+    "Shows some understanding but needs improvement.",
+    "Decent attempt but some concepts need clarification.",
+    "Good work with minor issues. Well done overall.",
+    "Excellent work! Clear understanding demonstrated.",
+)
+
+# Simulated scores fall uniformly in this fraction of max_points
+SCORE_LOW = 0.6
+SCORE_HIGH = 0.95
+_SCORE_SPAN = SCORE_HIGH - SCORE_LOW
+
+
+def feedback_band(score, max_points):
+    """Index into FEEDBACK_MESSAGES of the band a score falls in"""
+    return bisect_right(FEEDBACK_THRESHOLDS, (score / max_points) * 100)
+
+
+def generate_feedback(score, max_points, question_id):
+    """Generate realistic feedback based on score"""
+    return FEEDBACK_MESSAGES[feedback_band(score, max_points)]
+
+
+def simulate_ai_grading(assignment_type, questions, rng=None):
+    """Simulate AI grading with realistic score distribution.
+
+    Scores are drawn from rng (a random.Random) when given, otherwise from
+    the module-level random generator.
+    """
+    uniform = (rng or random).uniform
+    graded_questions = []
+    total_score = 0
+    max_total = 0
+
+    for question in questions:
+        max_points = question["max_points"]
+        max_total += max_points
+
+        # Simulate realistic grading with some variation
+        base_score = max_points * uniform(SCORE_LOW, SCORE_HIGH)
+        score = round(base_score, 1)
+        score = min(score, max_points)  # Cap at max points
+
+        total_score += score
+
+        feedback = generate_feedback(score, max_points, question["id"])
+
+        graded_questions.append({
+            "question_id": question["id"],
+            "description": question["description"],
+            "score": score,
+            "max_points": max_points,
+            "feedback": feedback,
+            "student_answer": question.get("student_answer", "")
+        })
+
+    percentage = round((total_score / max_total) * 100, 1)
+
+    return {
+        "questions": graded_questions,
+        "total_score": round(total_score, 1),
+        "max_total": max_total,
+        "percentage": percentage
+    }
+
+
+def grading_result(submission, result):
+    """Attach submission details to a simulate_ai_grading result"""
+    result['submission_id'] = submission['id']
+    result['student_name'] = submission['student_name']
+    result['filename'] = submission['filename']
+    result['assignment_type'] = submission['assignment_type']
+    return result
+
+
+def select_batch(store, body):
+    """Resolve a grade-batch request body to (submissions, missing_ids).
+
+    The body either lists "submission_ids" or filters by "status" and/or
+    "assignment_type"; raises ValueError if it does neither.
+    """
+    if 'submission_ids' in body:
+        ids = body['submission_ids']
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise ValueError("submission_ids must be a list of strings")
+        submissions = []
+        missing = []
+        for submission_id in dict.fromkeys(ids):
+            submission = store.get(submission_id)
+            if submission is None:
+                missing.append(submission_id)
+            else:
+                submissions.append(submission)
+        return submissions, missing
+
+    filters = {field: body[field] for field in ('status', 'assignment_type') if body.get(field) is not None}
+    if not filters:
+        raise ValueError("Provide submission_ids or a status/assignment_type filter")
+    for field, value in filters.items():
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+    return store.find(**filters), []
+
+
+def batch_seed(body):
+    """The grade-batch body's "seed", or None; raises ValueError unless it
+    is an integer or a string"""
+    seed = body.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+        raise ValueError("seed must be an integer or a string")
+    return seed
+
+
+def grade_batch(submissions, seed=None):
+    """Grade many submissions at once.
+
+    Draws one score per (submission, question) pair up front, then picks
+    every feedback message with a single threshold lookup per score. Given
+    the same seed this matches calling simulate_ai_grading on each
+    submission in order with random.Random(seed).
+    """
+    rng = random.Random(seed)
+    draw = rng.random
+
+    # Flatten every question of every submission into parallel columns
+    max_points = [q["max_points"] for s in submissions for q in s['questions']]
+    draws = [draw() for _ in max_points]
+    scores = [
+        min(round(points * (SCORE_LOW + _SCORE_SPAN * u), 1), points)
+        for points, u in zip(max_points, draws)
+    ]
+    bands = [
+        bisect_right(FEEDBACK_THRESHOLDS, (score / points) * 100)
+        for score, points in zip(scores, max_points)
+    ]
+
+    results = []
+    i = 0
+    for submission in submissions:
+        graded_questions = []
+        total_score = 0
+        max_total = 0
+        for question in submission['questions']:
+            score = scores[i]
+            points = max_points[i]
+            total_score += score
+            max_total += points
+            graded_questions.append({
+                "question_id": question["id"],
+                "description": question["description"],
+                "score": score,
+                "max_points": points,
+                "feedback": FEEDBACK_MESSAGES[bands[i]],
+                "student_answer": question.get("student_answer", "")
+            })
+            i += 1
+        results.append(grading_result(submission, {
+            "questions": graded_questions,
+            "total_score": round(total_score, 1),
+            "max_total": max_total,
+            "percentage": round((total_score / max_total) * 100, 1)
+        }))
+    return results
+
+
+def normalize_answer(text):
+    """Canonical form of an answer for cache lookups: Unicode-normalized,
+    case-folded, with runs of whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def answer_key(assignment_type, question_id, answer):
+    """Stable 16-byte digest of (rubric, question, normalized answer)"""
+    material = f"{assignment_type}\x1f{question_id}\x1f{normalize_answer(answer)}"
+    return hashlib.blake2b(material.encode(), digest_size=16).digest()
+
+
+class GradingCache:
+    """Memoizes per-question grades in front of a grading backend.
+
+    Entries are keyed on the rubric (assignment type), question id and a
+    hash of the normalized answer, and evicted least-recently-used past
+    max_entries. Misses are graded with a random.Random seeded from the
+    key, so a fresh grade always equals the cached one. With no backend
+    the simulated grader is used. The cache has the same grade() signature
+    as a backend, so it can stand in for one; a caller that passes its own
+    rng (a seeded batch) bypasses the cache and gets that rng's draws.
+    Backend calls are timed into `metrics` when one is given.
+    """
+
+    def __init__(self, backend=None, max_entries=100_000, metrics=None):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def grade(self, assignment_type, questions, rng=None):
+        """Grade a submission's questions like simulate_ai_grading"""
+        if rng is not None:
+            return self._call_backend(assignment_type, questions, rng)
+        graded_questions = []
+        total_score = 0
+        max_total = 0
+        for question in questions:
+            max_points = question["max_points"]
+            score, feedback = self.grade_question(assignment_type, question)
+            total_score += score
+            max_total += max_points
+            graded_questions.append({
+                "question_id": question["id"],
+                "description": question["description"],
+                "score": score,
+                "max_points": max_points,
+                "feedback": feedback,
+                "student_answer": question.get("student_answer", "")
+            })
+        return {
+            "questions": graded_questions,
+            "total_score": round(total_score, 1),
+            "max_total": max_total,
+            "percentage": round((total_score / max_total) * 100, 1)
+        }
+
+    def grade_question(self, assignment_type, question):
+        """Return (score, feedback) for one question, from cache if possible"""
+        key = answer_key(assignment_type, question["id"], question.get("student_answer", ""))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        rng = random.Random(int.from_bytes(key[:8], 'big'))
+        graded = self._call_backend(assignment_type, [question], rng)
+        entry = (graded["questions"][0]["score"], graded["questions"][0]["feedback"])
+
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def grade_batch(self, submissions, seed):
+        """Grade submissions in order with draws from random.Random(seed),
+        bypassing the cache, as a job with that seed does. A backend with a
+        grade_batch of its own, like the simulated one, grades the whole
+        batch in one pass."""
+        batch = grade_batch if self.backend is None else getattr(self.backend, 'grade_batch', None)
+        if batch is None:
+            rng = random.Random(seed)
+            return [grading_result(s, self._call_backend(s['assignment_type'], s['questions'], rng))
+                    for s in submissions]
+        start = time.perf_counter()
+        results = batch(submissions, seed)
+        if self.metrics is not None:
+            self._observe_batch(submissions, time.perf_counter() - start)
+        return results
+
+    def _call_backend(self, assignment_type, questions, rng):
+        start = time.perf_counter()
+        if self.backend is None:
+            graded = simulate_ai_grading(assignment_type, questions, rng)
+        else:
+            graded = self.backend.grade(assignment_type, questions, rng)
+        if self.metrics is not None:
+            self.metrics.observe_grading(assignment_type, time.perf_counter() - start, len(questions))
+        return graded
+
+    def _observe_batch(self, submissions, seconds):
+        # Split a one-pass batch's time across submissions by question count
+        total = sum(len(s['questions']) for s in submissions)
+        if not total:
+            return
+        for submission in submissions:
+            count = len(submission['questions'])
+            self.metrics.observe_grading(submission['assignment_type'], seconds * count / total, count)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,119 @@
+"""
+Response writing shared by every route.
+Status lines and the fixed header blocks are encoded once and reused, and
+each response goes out in a single write instead of one send_header call
+per line.
+"""
+
+import json
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+
+CORS = b'Access-Control-Allow-Origin: *\r\n'
+JSON_HEADERS = b'Content-Type: application/json\r\n' + CORS
+SSE_HEADERS = b'Content-Type: text/event-stream\r\nCache-Control: no-cache\r\n' + CORS
+PREFLIGHT_HEADERS = (
+    CORS
+    + b'Access-Control-Allow-Methods: GET, POST, PUT, DELETE, OPTIONS\r\n'
+    + b'Access-Control-Allow-Headers: Content-Type, Authorization\r\n'
+)
+
+# Statuses that never carry a body or a Content-Length
+_BODYLESS = (204, 304)
+
+_status_lines = {}
+_error_bodies = {}
+_date = [0, b'']
+
+
+def _status_line(handler, status):
+    key = (handler.protocol_version, status)
+    line = _status_lines.get(key)
+    if line is None:
+        reason = HTTPStatus(status).phrase
+        line = f"{handler.protocol_version} {status} {reason}\r\n".encode('latin-1')
+        _status_lines[key] = line
+    return line
+
+
+def _date_header():
+    # Re-render the Date header at most once per second
+    now = int(time.time())
+    if _date[0] != now:
+        _date[1] = b'Date: ' + formatdate(now, usegmt=True).encode('latin-1') + b'\r\n'
+        _date[0] = now
+    return _date[1]
+
+
+def _encode_headers(headers):
+    return b''.join(f"{name}: {value}\r\n".encode('latin-1') for name, value in headers)
+
+
+def send_body(handler, status, body=b'', header_block=JSON_HEADERS, headers=()):
+    """Write a complete response with a Content-Length in one write"""
+    handler.wfile.write(b''.join((
+        _status_line(handler, status),
+        _date_header(),
+        header_block,
+        _encode_headers(headers),
+        b'\r\n' if status in _BODYLESS else b'Content-Length: %d\r\n\r\n' % len(body),
+        body,
+    )))
+    handler.log_request(status, len(body))
+
+
+def send_json(handler, status, payload, headers=()):
+    send_body(handler, status, json.dumps(payload).encode(), JSON_HEADERS, headers)
+
+
+def send_error_json(handler, status, message, headers=()):
+    body = _error_bodies.get(message)
+    if body is None:
+        body = json.dumps({"error": message}).encode()
+        if len(_error_bodies) < 256:
+            _error_bodies[message] = body
+    send_body(handler, status, body, JSON_HEADERS, headers)
+
+
+class Stream:
+    """Response body of unknown length, written incrementally.
+
+    Uses chunked transfer encoding when both sides speak HTTP/1.1 and
+    otherwise marks the connection to close after the body.
+    """
+
+    def __init__(self, handler, status, header_block, headers=()):
+        self.handler = handler
+        self.chunked = handler.protocol_version >= 'HTTP/1.1' and handler.request_version >= 'HTTP/1.1'
+        if self.chunked:
+            framing = b'Transfer-Encoding: chunked\r\n\r\n'
+        else:
+            handler.close_connection = True
+            framing = b'Connection: close\r\n\r\n'
+        handler.wfile.write(b''.join((
+            _status_line(handler, status),
+            _date_header(),
+            header_block,
+            _encode_headers(headers),
+            framing,
+        )))
+        self.size = 0
+        self.status = status
+
+    def write(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.chunked:
+            data = b'%x\r\n%s\r\n' % (len(data), data)
+        self.handler.wfile.write(data)
+
+    def flush(self):
+        self.handler.wfile.flush()
+
+    def close(self):
+        if self.chunked:
+            self.handler.wfile.write(b'0\r\n\r\n')
+        self.handler.wfile.flush()
+        self.handler.log_request(self.status, self.size)
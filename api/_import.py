@@ -0,0 +1,191 @@
+"""
+Bulk import of submissions from newline-delimited JSON.
+The request body is read in fixed-size chunks and each line is validated
+against the rubrics as soon as it is complete, then inserted in batches,
+so memory use stays flat however large the upload is.
+"""
+
+import json
+
+CHUNK_BYTES = 64 * 1024
+MAX_LINE_BYTES = 1024 * 1024
+BATCH_SIZE = 500
+# Per-line errors listed in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+_REQUIRED_FIELDS = ('id', 'student_name', 'student_id', 'assignment_type')
+# Stored with these defaults when absent, so imported records have the
+# same shape as the built-in ones and grading can read every field
+_OPTIONAL_FIELDS = {'filename': '', 'submitted_at': None}
+
+
+def iter_lines(rfile, length, chunk_bytes=CHUNK_BYTES, max_line_bytes=MAX_LINE_BYTES):
+    """Yield (line number, line bytes or None) for `length` bytes of rfile.
+
+    Lines longer than max_line_bytes are skipped as they stream past and
+    yielded as None. Blank lines are not yielded. Raises EOFError if the
+    body is shorter than length.
+    """
+    line_no = 0
+    pending = b''
+    oversized = False
+    remaining = length
+    while remaining > 0:
+        chunk = rfile.read(min(chunk_bytes, remaining))
+        if not chunk:
+            raise EOFError("Request body ended early")
+        remaining -= len(chunk)
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                break
+            line_no += 1
+            if oversized:
+                oversized = False
+                pending = b''
+                yield line_no, None
+            else:
+                line = pending + chunk[start:end] if pending else chunk[start:end]
+                pending = b''
+                if len(line) > max_line_bytes:
+                    yield line_no, None
+                elif line.strip():
+                    yield line_no, line
+            start = end + 1
+        if not oversized:
+            pending += chunk[start:]
+            if len(pending) > max_line_bytes:
+                oversized = True
+                pending = b''
+    if oversized:
+        yield line_no + 1, None
+    elif pending.strip():
+        yield line_no + 1, pending
+
+
+def validate_submission(record, rubrics):
+    """Check one decoded record against the rubrics and return it in the
+    stored shape; raises ValueError describing the first problem.
+
+    Every rubric question must be answered exactly once. Questions may
+    give just id and student_answer; description and max_points are
+    filled in from the rubric and must match it if given. Questions are
+    stored in rubric order.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    for field in _REQUIRED_FIELDS:
+        if not isinstance(record.get(field), str) or not record[field]:
+            raise ValueError(f"{field} must be a non-empty string")
+    rubric = rubrics.get(record['assignment_type'])
+    if rubric is None:
+        raise ValueError(f"unknown assignment_type: {record['assignment_type']}")
+
+    for field in _OPTIONAL_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise ValueError(f"{field} must be a string")
+    if record.get('status', 'pending_grading') != 'pending_grading':
+        raise ValueError("imported submissions must have status pending_grading")
+
+    # Same key order as the built-in submissions
+    submission = {}
+    for field in ('id', 'student_name', 'student_id', 'filename', 'assignment_type', 'submitted_at'):
+        if field in _OPTIONAL_FIELDS:
+            value = record.get(field)
+            submission[field] = _OPTIONAL_FIELDS[field] if value is None else value
+        else:
+            submission[field] = record[field]
+    submission['status'] = 'pending_grading'
+
+    answers = record.get('questions')
+    if not isinstance(answers, list):
+        raise ValueError("questions must be a list")
+    by_id = {q['id']: q for q in rubric['questions']}
+    given = {}
+    for answer in answers:
+        if not isinstance(answer, dict):
+            raise ValueError("each question must be a JSON object")
+        question_id = answer.get('id')
+        rubric_question = by_id.get(question_id)
+        if rubric_question is None:
+            raise ValueError(f"question {question_id!r} is not in the {submission['assignment_type']} rubric")
+        if question_id in given:
+            raise ValueError(f"question {question_id} appears twice")
+        for field in ('description', 'max_points'):
+            if field in answer and answer[field] != rubric_question[field]:
+                raise ValueError(f"question {question_id}: {field} does not match the rubric")
+        if not isinstance(answer.get('student_answer'), str):
+            raise ValueError(f"question {question_id}: student_answer must be a string")
+        given[question_id] = answer['student_answer']
+    missing = [q['id'] for q in rubric['questions'] if q['id'] not in given]
+    if missing:
+        raise ValueError(f"missing answers for questions: {', '.join(missing)}")
+    submission['questions'] = [
+        {
+            "id": q['id'],
+            "description": q['description'],
+            "max_points": q['max_points'],
+            "student_answer": given[q['id']],
+        }
+        for q in rubric['questions']
+    ]
+    return submission
+
+
+def import_submissions(store, rfile, length, rubrics, batch_size=BATCH_SIZE):
+    """Stream NDJSON submissions from rfile into store; returns a summary
+    with per-line errors"""
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    batch_lines = {}
+
+    def error(line_no, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_no, "error": message})
+
+    def flush():
+        nonlocal imported
+        added, skipped = store.add_many(batch)
+        imported += len(added)
+        for submission_id in skipped:
+            error(batch_lines[submission_id], f"duplicate submission id: {submission_id}")
+        batch.clear()
+        batch_lines.clear()
+
+    line_no = 0
+    try:
+        for line_no, line in iter_lines(rfile, length):
+            if line is None:
+                error(line_no, f"line is longer than {MAX_LINE_BYTES} bytes")
+                continue
+            try:
+                submission = validate_submission(json.loads(line), rubrics)
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError too
+                error(line_no, str(e))
+                continue
+            if submission['id'] in batch_lines:
+                error(line_no, f"duplicate submission id: {submission['id']}")
+                continue
+            batch.append(submission)
+            batch_lines[submission['id']] = line_no
+            if len(batch) >= batch_size:
+                flush()
+    except EOFError as e:
+        # Keep what arrived complete; the cut-off line is reported
+        error(line_no + 1, str(e))
+    if batch:
+        flush()
+
+    errors.sort(key=lambda e: e['line'])
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
@@ -0,0 +1,297 @@
+"""
+Background grading jobs.
+Grading requests can be queued as jobs and processed by a bounded pool of
+worker threads; clients poll GET /api/jobs/{id} or follow the job's
+Server-Sent Events stream for progress and results.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+from _grading import grade_batch, grading_result, simulate_ai_grading
+from _http import SSE_HEADERS, Stream
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+FINISHED = (SUCCEEDED, FAILED, TIMED_OUT)
+
+# Seconds between keep-alive comments on an idle event stream
+SSE_HEARTBEAT = 15
+
+# Seconds a job may run unless GRADING_JOB_TIMEOUT says otherwise
+DEFAULT_JOB_TIMEOUT = 300
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class SimulatedBackend:
+    """Grades with simulate_ai_grading in-process"""
+
+    def grade(self, assignment_type, questions, rng=None):
+        return simulate_ai_grading(assignment_type, questions, rng)
+
+    def grade_batch(self, submissions, seed):
+        """Grade submissions in one pass, drawing what grade() would in
+        order from random.Random(seed)"""
+        return grade_batch(submissions, seed)
+
+
+class FakeLatencyBackend:
+    """Simulated grading that takes `latency` seconds per call, to stand
+    in for a real model call"""
+
+    def __init__(self, latency=1.0):
+        self.latency = latency
+
+    def grade(self, assignment_type, questions, rng=None):
+        time.sleep(self.latency)
+        return simulate_ai_grading(assignment_type, questions, rng)
+
+
+def backend_from_env():
+    """Pick the grading backend named by GRADING_BACKEND (simulated or fake)"""
+    name = os.environ.get('GRADING_BACKEND', 'simulated')
+    if name == 'fake':
+        return FakeLatencyBackend(float(os.environ.get('GRADING_FAKE_LATENCY', '1.0')))
+    if name == 'simulated':
+        return SimulatedBackend()
+    raise ValueError(f"Unknown GRADING_BACKEND: {name}")
+
+
+def job_timeout_from_env():
+    """Per-job timeout in seconds from GRADING_JOB_TIMEOUT"""
+    timeout = float(os.environ.get('GRADING_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT))
+    if timeout <= 0:
+        raise ValueError("GRADING_JOB_TIMEOUT must be positive")
+    return timeout
+
+
+def _timestamp(seconds):
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class Job:
+    """A queued grading request for one or more submissions"""
+
+    def __init__(self, submissions, on_result, seed=None, timeout=None):
+        self.id = f"job_{os.urandom(6).hex()}"
+        self.submissions = submissions
+        self.on_result = on_result
+        self.seed = seed
+        self.timeout = timeout
+        self.status = QUEUED
+        self.results = []
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def to_dict(self):
+        with self._changed:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": len(self.submissions),
+                "completed": len(self.results),
+                "results": list(self.results),
+                "error": self.error,
+                "created_at": _timestamp(self.created_at),
+                "started_at": _timestamp(self.started_at),
+                "finished_at": _timestamp(self.finished_at),
+            }
+
+    def wait(self, seen, timeout=None):
+        """Block until more than `seen` results exist or the job finishes.
+        Returns (new results, finished)."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.results) > seen or self.finished, timeout)
+            return self.results[seen:], self.finished
+
+    def _update(self, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def _add_result(self, result):
+        with self._changed:
+            self.results.append(result)
+            self._changed.notify_all()
+
+
+class JobQueue:
+    """Bounded queue of grading jobs served by a fixed pool of worker threads.
+
+    Workers start on the first submit. A job that runs past its timeout is
+    marked timed_out as soon as the deadline passes, even in the middle of
+    a backend call, whose result is then discarded. The results graded
+    before the deadline are kept.
+
+    Backend calls run on threads of their own so they can be abandoned,
+    but no more than `workers` at once: an abandoned call keeps its slot
+    until the backend returns, so a stuck backend times jobs out rather
+    than piling up calls to it.
+    """
+
+    def __init__(self, backend=None, workers=4, max_pending=100, job_timeout=DEFAULT_JOB_TIMEOUT,
+                 max_jobs=1000):
+        self.backend = backend or SimulatedBackend()
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._calls = threading.BoundedSemaphore(workers)
+
+    def submit(self, submissions, on_result, seed=None, timeout=None):
+        """Queue a job; raises QueueFull instead of blocking when at capacity"""
+        job = Job(submissions, on_result, seed, timeout or self.job_timeout)
+        self._start_workers()
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull("Grading queue is full, retry later")
+        with self._lock:
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _prune(self):
+        # Forget the oldest finished jobs once over max_jobs
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"grading-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        rng = random.Random(job.seed) if job.seed is not None else None
+        started = time.time()
+        deadline = started + job.timeout
+        job._update(status=RUNNING, started_at=started)
+        try:
+            for submission in job.submissions:
+                try:
+                    call = self._call(deadline, self.backend.grade, submission['assignment_type'],
+                                      submission['questions'], rng)
+                    graded = call.result(timeout=max(deadline - time.time(), 0))
+                except FutureTimeout:
+                    job._update(status=TIMED_OUT, error="Job exceeded its timeout", finished_at=time.time())
+                    return
+                result = grading_result(submission, graded)
+                job.on_result(result)
+                job._add_result(result)
+        except Exception as e:
+            job._update(status=FAILED, error=str(e), finished_at=time.time())
+            return
+        job._update(status=SUCCEEDED, finished_at=time.time())
+
+
+    def _call(self, deadline, fn, *args):
+        """Run fn(*args) on a daemon thread once a call slot is free and
+        return a Future for it; raises FutureTimeout if none frees up by
+        the deadline"""
+        if not self._calls.acquire(timeout=max(deadline - time.time(), 0)):
+            raise FutureTimeout()
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._calls.release()
+
+        threading.Thread(target=run, name='grading-call', daemon=True).start()
+        return future
+
+
+def wants_async(query_string):
+    """True if the request's query string asks for a background job (?async=1).
+    Grading stays inline by default: jobs run in-process, which a serverless
+    function frozen after its response can't do."""
+    value = parse_qs(query_string).get('async', [''])[0]
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def job_links(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events",
+    }
+
+
+def stream_job_events(handler, job):
+    """Write a job's progress to the client as Server-Sent Events.
+
+    Sends a `progress` event per graded submission and a final `done`
+    event carrying the full job, then returns.
+    """
+    stream = Stream(handler, 200, SSE_HEADERS)
+    seen = 0
+    total = len(job.submissions)
+    while True:
+        results, finished = job.wait(seen, timeout=SSE_HEARTBEAT)
+        for result in results:
+            seen += 1
+            payload = {"job_id": job.id, "completed": seen, "total": total, "result": result}
+            stream.write(f"event: progress\ndata: {json.dumps(payload)}\n\n".encode())
+        if finished:
+            stream.write(f"event: done\ndata: {json.dumps(job.to_dict())}\n\n".encode())
+            stream.close()
+            return
+        if not results:
+            stream.write(b": keep-alive\n\n")
+        stream.flush()
@@ -0,0 +1,128 @@
+"""
+In-process metrics for the grading API, rendered in the Prometheus text
+exposition format at GET /api/metrics.
+Recording a request is a few dictionary lookups and list increments under
+one lock, so it stays on in production.
+"""
+
+import threading
+from bisect import bisect_left
+
+from _http import CORS
+
+METRICS_HEADERS = b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n' + CORS
+
+# Histogram upper bounds; everything larger lands in +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+GRADING_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value, n=1):
+        self.counts[bisect_left(self.buckets, value)] += n
+        self.sum += value * n
+        self.count += n
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {round(self.sum, 6)}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class _RouteSeries:
+    __slots__ = ('statuses', 'latency', 'size')
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Request and grading counters for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._grading = {}
+
+    def observe_request(self, method, route, status, seconds, size):
+        """Record one answered request; route is the matched path template"""
+        key = (method, route)
+        with self._lock:
+            series = self._routes.get(key)
+            if series is None:
+                series = self._routes[key] = _RouteSeries()
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+            series.latency.observe(seconds)
+            series.size.observe(size)
+
+    def observe_grading(self, assignment_type, seconds, questions=1):
+        """Record a grading call that took `seconds` for `questions` questions,
+        as that many observations of the per-question duration"""
+        if not questions:
+            return
+        with self._lock:
+            histogram = self._grading.get(assignment_type)
+            if histogram is None:
+                histogram = self._grading[assignment_type] = Histogram(GRADING_BUCKETS)
+            histogram.observe(seconds / questions, questions)
+
+    def render(self, extra=()):
+        """Prometheus text format. extra is a sequence of
+        (name, type, help, value) for gauges and counters kept elsewhere."""
+        lines = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+            grading = sorted(self._grading.items())
+
+            lines.append('# HELP grading_http_requests_total Requests answered, by route and status.')
+            lines.append('# TYPE grading_http_requests_total counter')
+            for (method, route), series in routes:
+                for status, count in sorted(series.statuses.items()):
+                    lines.append(f'grading_http_requests_total{{method="{method}",route="{_label(route)}",'
+                                 f'status="{status}"}} {count}')
+
+            lines.append('# HELP grading_http_request_duration_seconds Time to answer a request.')
+            lines.append('# TYPE grading_http_request_duration_seconds histogram')
+            for (method, route), series in routes:
+                lines.extend(series.latency.render('grading_http_request_duration_seconds',
+                                                   f'method="{method}",route="{_label(route)}"'))
+
+            lines.append('# HELP grading_http_response_size_bytes Response body size.')
+            lines.append('# TYPE grading_http_response_size_bytes histogram')
+            for (method, route), series in routes:
+                lines.extend(series.size.render('grading_http_response_size_bytes',
+                                                f'method="{method}",route="{_label(route)}"'))
+
+            lines.append('# HELP grading_question_duration_seconds Time to grade one question.')
+            lines.append('# TYPE grading_question_duration_seconds histogram')
+            for assignment_type, histogram in grading:
+                lines.extend(histogram.render('grading_question_duration_seconds',
+                                              f'assignment_type="{_label(assignment_type)}"'))
+
+        for name, kind, help_text, value in extra:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        lines.append('')
+        return '\n'.join(lines)
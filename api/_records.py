@@ -0,0 +1,192 @@
+"""
+Compact in-memory submission records.
+A record keeps only the per-student fields. Question ids, descriptions and
+max points live in one shared tuple per distinct question set (in practice
+one per rubric). A submission's answers are packed into one UTF-8 bytes
+object, and scores and feedback are tuples in question order. Records
+expand back to the JSON shape the API has always returned with to_dict().
+"""
+
+# Top-level fields in the order they are serialized
+FIELDS = (
+    'id', 'student_name', 'student_id', 'filename', 'assignment_type', 'submitted_at', 'status',
+    'questions', 'total_score', 'max_total', 'percentage', 'graded_at',
+)
+_SCALARS = tuple(field for field in FIELDS if field != 'questions')
+_SCALAR_SET = frozenset(_SCALARS)
+
+_QUESTION_KEYS = frozenset(('id', 'description', 'max_points', 'student_answer'))
+_GRADED_QUESTION_KEYS = _QUESTION_KEYS | {'score', 'feedback'}
+
+# Low-cardinality strings held once no matter how many records use them
+_SHARED_FIELDS = frozenset(('assignment_type', 'status'))
+_shared = {}
+
+_missing = object()
+
+_ANSWER_SEPARATOR = '\x00'
+
+# (id, description, max_points) triples per distinct question set
+_question_sets = {}
+
+
+def _share(value):
+    if type(value) is str:
+        return _shared.setdefault(value, value)
+    return value
+
+
+def _pack_answers(answers):
+    # One bytes object instead of a str per answer; answers that can't be
+    # joined unambiguously stay a tuple
+    if all(type(a) is str and _ANSWER_SEPARATOR not in a for a in answers):
+        try:
+            return _ANSWER_SEPARATOR.join(answers).encode()
+        except UnicodeEncodeError:
+            pass
+    return tuple(answers)
+
+
+def question_set(questions):
+    """The shared (id, description, max_points) tuple for these questions"""
+    key = tuple((q['id'], q['description'], q['max_points']) for q in questions)
+    return _question_sets.setdefault(key, key)
+
+
+class Submission:
+    """One submission, readable like the dict it was built from.
+
+    record['questions'] and to_dict() build fresh dicts on every call, so
+    changes go through the store (or record['questions'] = ...), never
+    through the returned dicts.
+    """
+
+    __slots__ = _SCALARS + ('question_set', 'answers', 'scores', 'feedback', 'raw_questions', 'extra')
+
+    def __init__(self, data):
+        self.question_set = ()
+        self.answers = ()
+        self.scores = None
+        self.feedback = None
+        self.raw_questions = None
+        self.extra = None
+        for key, value in data.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        return data if isinstance(data, cls) else cls(data)
+
+    def question_dicts(self):
+        """The questions in their JSON shape"""
+        if self.raw_questions is not None:
+            return [dict(q) for q in self.raw_questions]
+        answers = self.answer_list()
+        questions = []
+        for i, (question_id, description, max_points) in enumerate(self.question_set):
+            question = {
+                "id": question_id,
+                "description": description,
+                "max_points": max_points,
+                "student_answer": answers[i],
+            }
+            if self.scores is not None:
+                question["score"] = self.scores[i]
+                question["feedback"] = self.feedback[i]
+            questions.append(question)
+        return questions
+
+    def question_scores(self):
+        """(question id, score or None) for each question, in order"""
+        if self.raw_questions is not None:
+            return [(q.get('id'), q.get('score')) for q in self.raw_questions]
+        if self.scores is None:
+            return [(question[0], None) for question in self.question_set]
+        return [(question[0], score) for question, score in zip(self.question_set, self.scores)]
+
+    def graded_scores(self):
+        """(question id, max points, score) for each scored question"""
+        if self.raw_questions is not None:
+            return [(q.get('id'), q.get('max_points'), q['score']) for q in self.raw_questions
+                    if q.get('score') is not None]
+        if self.scores is None:
+            return []
+        return [(question[0], question[2], score) for question, score in zip(self.question_set, self.scores)
+                if score is not None]
+
+    def answer_list(self):
+        """The student answers in question order"""
+        if type(self.answers) is bytes:
+            return self.answers.decode().split(_ANSWER_SEPARATOR) if self.question_set else []
+        return list(self.answers)
+
+    def to_dict(self):
+        data = {}
+        for field in FIELDS:
+            if field == 'questions':
+                data['questions'] = self.question_dicts()
+                continue
+            value = getattr(self, field, _missing)
+            if value is not _missing:
+                data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def _set_questions(self, questions):
+        keys = {frozenset(q) for q in questions}
+        if keys <= {_QUESTION_KEYS} or keys == {_GRADED_QUESTION_KEYS}:
+            self.raw_questions = None
+            self.question_set = question_set(questions)
+            self.answers = _pack_answers([q['student_answer'] for q in questions])
+            if keys == {_GRADED_QUESTION_KEYS}:
+                self.scores = tuple(q['score'] for q in questions)
+                self.feedback = tuple(_share(q['feedback']) for q in questions)
+            else:
+                self.scores = self.feedback = None
+        else:
+            # Partly graded or unusual questions are kept as given
+            self.raw_questions = [dict(q) for q in questions]
+            self.question_set = self.answers = ()
+            self.scores = self.feedback = None
+
+    # Mapping-style access for code written against the dict shape
+
+    def __getitem__(self, key):
+        if key == 'questions':
+            return self.question_dicts()
+        if key in _SCALAR_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'questions':
+            self._set_questions(value)
+        elif key in _SCALAR_SET:
+            setattr(self, key, _share(value) if key in _SHARED_FIELDS else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        if key == 'questions':
+            return True
+        if key in _SCALAR_SET:
+            return hasattr(self, key)
+        return bool(self.extra) and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Submission({self.to_dict()!r})"
+
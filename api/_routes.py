@@ -0,0 +1,71 @@
+"""
+Route table for the grading API.
+Routes are declared once with path templates such as
+/api/submissions/{id}/grade and compiled into dictionaries, so matching a
+request is a couple of hash lookups rather than a chain of comparisons.
+"""
+
+
+class Router:
+    def __init__(self):
+        self._routes = []
+        self.templates = {}
+        self._static = {}
+        # (method, segment count) -> [(param positions, literal positions,
+        #                             {literal segments: (fn, param names)})]
+        self._dynamic = {}
+
+    def route(self, method, template):
+        """Decorator registering a route function for method + template"""
+        def register(fn):
+            self._routes.append((method, template, fn))
+            self.templates[fn] = template
+            self._static.clear()
+            self._dynamic.clear()
+            return fn
+        return register
+
+    def compile(self):
+        static = {}
+        dynamic = {}
+        for method, template, fn in self._routes:
+            segments = template.strip('/').split('/')
+            params = tuple(
+                (i, segment[1:-1]) for i, segment in enumerate(segments)
+                if segment.startswith('{') and segment.endswith('}')
+            )
+            if not params:
+                static[(method, '/' + '/'.join(segments))] = fn
+                continue
+            positions = tuple(i for i, _ in params)
+            literals = tuple(i for i in range(len(segments)) if i not in positions)
+            shapes = dynamic.setdefault((method, len(segments)), [])
+            for shape_positions, _, table in shapes:
+                if shape_positions == positions:
+                    break
+            else:
+                table = {}
+                shapes.append((positions, literals, table))
+            table[tuple(segments[i] for i in literals)] = (fn, tuple(name for _, name in params))
+        self._static = static
+        self._dynamic = dynamic
+
+    def match(self, method, path):
+        """Return (fn, params) for a request, or (None, None) if nothing matches"""
+        if not self._static and not self._dynamic:
+            self.compile()
+        path = '/' + path.strip('/')
+        fn = self._static.get((method, path))
+        if fn is not None:
+            return fn, {}
+
+        segments = path[1:].split('/')
+        shapes = self._dynamic.get((method, len(segments)))
+        if shapes is None:
+            return None, None
+        for positions, literals, table in shapes:
+            hit = table.get(tuple([segments[i] for i in literals]))
+            if hit is not None:
+                fn, names = hit
+                return fn, {name: segments[i] for name, i in zip(names, positions)}
+        return None, None
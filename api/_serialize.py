@@ -0,0 +1,145 @@
+"""
+Query parsing and streaming JSON serialization for submission listings
+"""
+
+import json
+from collections import namedtuple
+
+from _store import INDEXED_FIELDS
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 1000
+
+# Rows are encoded and written this many at a time
+STREAM_CHUNK_ROWS = 100
+
+# Listings of up to this many rows are encoded whole and cached; longer
+# ones are streamed a chunk at a time
+CACHED_LISTING_ROWS = MAX_PAGE_LIMIT
+
+ListingQuery = namedtuple('ListingQuery', ['filters', 'after', 'limit', 'fields', 'paginated', 'since'])
+
+
+def parse_listing_query(query):
+    """Build a ListingQuery from parse_qs output; raises ValueError on bad input.
+
+    Supported parameters:
+      status, assignment_type, student_id  - index filters
+      limit                                - page size, enables paginated output
+      cursor                               - next_cursor from a previous page
+      fields                               - comma-separated top-level fields to return
+      since                                - "<epoch>:<version>" from a previous change feed
+                                             response; return only what changed after it
+    """
+    filters = {field: query[field][0] for field in INDEXED_FIELDS if field in query}
+
+    paginated = 'limit' in query or 'cursor' in query
+    limit = None
+    if paginated:
+        try:
+            limit = int(query.get('limit', [DEFAULT_PAGE_LIMIT])[0])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, MAX_PAGE_LIMIT)
+
+    after = None
+    if 'cursor' in query and query['cursor'][0]:
+        try:
+            after = int(query['cursor'][0])
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        if after < 0:
+            raise ValueError("Invalid cursor")
+
+    fields = None
+    if 'fields' in query:
+        fields = tuple(f for f in query['fields'][0].split(',') if f)
+        if not fields:
+            raise ValueError("fields must not be empty")
+
+    since = None
+    if 'since' in query:
+        epoch, separator, version = query['since'][0].rpartition(':')
+        try:
+            version = int(version)
+        except ValueError:
+            version = -1
+        if not separator or version < 0:
+            raise ValueError("since must be the version of a previous change feed response")
+        since = (epoch, version)
+        if paginated:
+            raise ValueError("since cannot be combined with limit or cursor")
+
+    return ListingQuery(filters, after, limit, fields, paginated, since)
+
+
+def read_json_body(handler, max_bytes=10 * 1024 * 1024):
+    """Read and decode a JSON request body; an empty body decodes to {}"""
+    try:
+        length = int(handler.headers.get('Content-Length') or 0)
+    except ValueError:
+        raise ValueError("Invalid Content-Length")
+    if length > max_bytes:
+        raise ValueError("Request body too large")
+    if length <= 0:
+        return {}
+    try:
+        body = json.loads(handler.rfile.read(length))
+    except ValueError:
+        raise ValueError("Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+
+def project(submission, fields):
+    """Return the JSON shape of a submission record, or only the requested
+    top-level fields of it"""
+    if fields is None:
+        return submission.to_dict()
+    return {field: submission[field] for field in fields if field in submission}
+
+
+def iter_json_array(rows, fields=None):
+    """Yield a JSON array of rows as encoded chunks of STREAM_CHUNK_ROWS rows"""
+    yield b'['
+    for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+        page = rows[start:start + STREAM_CHUNK_ROWS]
+        chunk = ', '.join(json.dumps(project(row, fields)) for row in page)
+        yield (chunk if start == 0 else ', ' + chunk).encode()
+    yield b']'
+
+
+def iter_listing(rows, listing, next_cursor):
+    """Yield the encoded response body for a listing request.
+
+    Unpaginated requests get a bare JSON array, as before; paginated
+    requests get {"items": [...], "next_cursor": ...}.
+    """
+    if not listing.paginated:
+        yield from iter_json_array(rows, listing.fields)
+        return
+    yield b'{"items": '
+    yield from iter_json_array(rows, listing.fields)
+    cursor = None if next_cursor is None else str(next_cursor)
+    yield f', "next_cursor": {json.dumps(cursor)}}}'.encode()
+
+
+def iter_changes(changes, listing, position):
+    """Yield the encoded body of a delta listing.
+
+    changes is (rows, removed ids) from SubmissionStore.changed_since, or
+    None when the client has fallen behind and must fetch the full list.
+    position is the store's (epoch, version), returned as the next since.
+    """
+    epoch, version = position
+    head = f'{{"version": {json.dumps(f"{epoch}:{version}")}, '
+    if changes is None:
+        yield (head + '"resync": true, "changes": [], "removed": []}').encode()
+        return
+    rows, removed = changes
+    yield (head + '"resync": false, "changes": ').encode()
+    yield from iter_json_array(rows, listing.fields)
+    yield f', "removed": {json.dumps(removed)}}}'.encode()
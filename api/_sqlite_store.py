@@ -0,0 +1,458 @@
+"""
+SQLite-backed submission store.
+Keeps the in-memory indexes of SubmissionStore and persists every change
+to a SQLite database in WAL mode. Writes from concurrent requests are
+grouped into one transaction by a background writer, and every grade and
+status change is appended to a history table. Several processes can
+share one database (see `shared`).
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from _store import SubmissionStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS grade_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS grade_history_submission ON grade_history (submission_id, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Every written row takes the next revision, so a process can fetch just
+# the rows changed since the last revision it saw. In a shared database
+# revisions are also the change feed's versions.
+REV_INDEX = "CREATE INDEX IF NOT EXISTS submissions_rev ON submissions (rev)"
+
+
+class _Write:
+    __slots__ = ('submission_id', 'data', 'event', 'payload', 'previous', 'version', 'recorded_at', 'done',
+                 'error')
+
+    def __init__(self, submission, previous, version, event=None, payload=None):
+        self.submission_id = submission.id
+        self.data = json.dumps(submission.to_dict())
+        self.event = event
+        self.payload = payload
+        # The submission before this change (None for an insert) and the
+        # store version after it, for putting memory back if the commit fails
+        self.previous = previous
+        self.version = version
+        self.recorded_at = time.time()
+        self.done = threading.Event()
+        self.error = None
+
+
+class SQLiteSubmissionStore(SubmissionStore):
+    """SubmissionStore persisted to SQLite.
+
+    Nothing is read until the store is first used. On first use the
+    database is created and seeded with `seed` if it is empty, then loaded
+    into memory. Mutations update memory immediately and queue a write.
+    The writer thread commits everything queued within `batch_window`
+    seconds (or `batch_size` writes) in a single transaction. With
+    wait_for_commit the mutating call returns only after its batch has
+    committed.
+
+    With shared=True other processes may write the same database, as the
+    local_server.py prefork workers do. Every call first applies rows that
+    other processes have committed, which is cheap to check with PRAGMA
+    data_version. Each mutation then runs in its own immediate
+    transaction, holding the database write lock from that refresh until
+    it commits, so two processes can't overwrite each other's changes.
+    Shared stores don't batch writes. Their change feed counts in database
+    revisions under an epoch kept in the database, so every process gives
+    the same answer for the same since.
+    """
+
+    def __init__(self, path, seed=(), batch_window=0.005, batch_size=512, wait_for_commit=True,
+                 shared=False):
+        super().__init__()
+        self.path = path
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.wait_for_commit = wait_for_commit
+        self.shared = shared
+        self._seed = seed
+        self._loaded = False
+        self._db = None
+        # Reentrant so a shared-mode mutation can refresh inside its transaction
+        self._db_lock = threading.RLock()
+        self._data_version = None
+        self._rev = 0
+        # Writes made inside the current shared-mode transaction
+        self._transaction_writes = []
+        # Shared mode: a second connection for change feed queries, which
+        # run under the store lock and so mustn't wait for _db_lock
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._last_write = None
+        self._pending = []
+        self._pending_ready = threading.Condition()
+        self._writer = None
+
+    # Reads: load on first use, then serve from memory
+
+    @property
+    def version(self):
+        self._load()
+        return self._version
+
+    def __len__(self):
+        self._load()
+        return super().__len__()
+
+    def __contains__(self, submission_id):
+        self._load()
+        return super().__contains__(submission_id)
+
+    def get(self, submission_id):
+        self._load()
+        return super().get(submission_id)
+
+    def version_of(self, submission_id):
+        self._load()
+        return super().version_of(submission_id)
+
+    def all(self):
+        self._load()
+        return super().all()
+
+    def page(self, after=None, limit=None, **filters):
+        self._load()
+        return super().page(after=after, limit=limit, **filters)
+
+    def feed_position(self):
+        self._load()
+        if not self.shared:
+            return super().feed_position()
+        return self.epoch, self._rev
+
+    def changed_since(self, version, **filters):
+        self._load()
+        if not self.shared:
+            return super().changed_since(version, **filters)
+        # Revisions are the same in every process, so any of them can answer
+        # a client that another one served
+        with self.lock:
+            if version >= self._rev:
+                # Ahead of this process's last refresh: go back to it
+                return [], []
+            with self._reader_lock:
+                ids = [row[0] for row in self._reader.execute(
+                    "SELECT id FROM submissions WHERE rev > ? ORDER BY rev", (version,))]
+            rows = []
+            removed = []
+            for submission_id in ids:
+                row = self._by_id.get(submission_id)
+                if row is None:
+                    # Committed after the last refresh; the next poll has it
+                    continue
+                if all(getattr(row, field, None) == value for field, value in filters.items() if value is not None):
+                    rows.append(row)
+                else:
+                    removed.append(submission_id)
+            return rows, removed
+
+    # Writes: update memory, then persist
+
+    def add(self, submission):
+        with self._writing():
+            with self.lock:
+                submission = super().add(submission)
+                write = _Write(submission, None, self.version_of(submission.id))
+            self._persist(write)
+        return submission
+
+    def add_many(self, submissions):
+        with self._writing():
+            with self.lock:
+                added, skipped = SubmissionStore.add_many(self, submissions)
+                writes = [_Write(submission, None, self.version_of(submission.id)) for submission in added]
+            # One wait for the whole batch rather than a commit round trip per row
+            self._persist_many(writes)
+        return added, skipped
+
+    def set_status(self, submission_id, status):
+        with self._writing():
+            with self.lock:
+                previous = self._snapshot(submission_id)
+                version = self.version_of(submission_id)
+                submission = super().set_status(submission_id, status)
+                if submission is None or self.version_of(submission_id) == version:
+                    return submission
+                write = _Write(submission, previous, self.version_of(submission_id), 'status',
+                               json.dumps({"status": status}))
+            self._persist(write)
+        return submission
+
+    def record_grade(self, submission_id, result):
+        with self._writing():
+            with self.lock:
+                previous = self._snapshot(submission_id)
+                submission = super().record_grade(submission_id, result)
+                if submission is None:
+                    return None
+                write = _Write(submission, previous, self.version_of(submission_id), 'graded',
+                               json.dumps(result))
+            self._persist(write)
+        return submission
+
+    def history(self, submission_id):
+        """Every recorded grade and status change for a submission, oldest first"""
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT event, payload, recorded_at FROM grade_history WHERE submission_id = ? ORDER BY id",
+                (submission_id,)
+            ).fetchall()
+        return [{"event": event, "data": json.loads(payload), "recorded_at": recorded_at}
+                for event, payload, recorded_at in rows]
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self._load()
+        with self._pending_ready:
+            last = self._last_write
+        if last is not None:
+            last.done.wait()
+
+    def close(self):
+        if self._db is None:
+            return
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+        if self._reader is not None:
+            with self._reader_lock:
+                self._reader.close()
+                self._reader = None
+
+    def _load(self):
+        if self._loaded:
+            # A write in progress here refreshes inside its own transaction,
+            # so reads serve what is in memory rather than queue behind it
+            if self.shared and self._db_lock.acquire(blocking=False):
+                try:
+                    self._refresh()
+                finally:
+                    self._db_lock.release()
+            return
+        with self.lock:
+            if self._loaded:
+                return
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            # Upgrading a database from before revisions were tracked, and
+            # seeding, hold the write lock in case another process is starting
+            db.execute("BEGIN IMMEDIATE")
+            columns = [row[1] for row in db.execute("PRAGMA table_info(submissions)")]
+            if 'rev' not in columns:
+                db.execute("ALTER TABLE submissions ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            db.execute(REV_INDEX)
+            if db.execute("SELECT COUNT(*) FROM submissions").fetchone()[0] == 0 and self._seed:
+                db.executemany(
+                    "INSERT INTO submissions (id, seq, data) VALUES (?, ?, ?)",
+                    ((s['id'], seq, json.dumps(s)) for seq, s in enumerate(self._seed))
+                )
+            if self.shared:
+                # One epoch per database, so feed versions hold across workers and restarts
+                db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (self.epoch,))
+                self.epoch = db.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+            db.execute("COMMIT")
+            self._data_version = db.execute("PRAGMA data_version").fetchone()[0]
+            for data, rev in db.execute("SELECT data, rev FROM submissions ORDER BY seq, rowid"):
+                SubmissionStore.add(self, json.loads(data))
+                self._rev = max(self._rev, rev)
+            self._seed = ()
+            self._db = db
+            if self.shared:
+                self._reader = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            else:
+                self._writer = threading.Thread(target=self._write_loop, name='sqlite-writer', daemon=True)
+                self._writer.start()
+            atexit.register(self.close)
+            self._loaded = True
+
+    def _refresh(self):
+        """Apply rows other processes have committed since the last refresh.
+        Takes the database lock before the store lock, as writes do."""
+        with self._db_lock:
+            db = self._db
+            data_version = db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            rows = db.execute("SELECT data, rev FROM submissions WHERE rev > ? ORDER BY rev",
+                              (self._rev,)).fetchall()
+            if not rows:
+                return
+            with self.lock:
+                for data, rev in rows:
+                    submission = json.loads(data)
+                    if submission['id'] in self._by_id:
+                        self._replace(submission)
+                    else:
+                        self._insert(submission)
+                    self._rev = rev
+
+    @contextmanager
+    def _writing(self):
+        """Wrap a mutation and the writes it persists. A shared store runs
+        them in an immediate transaction begun before its refresh, so no
+        other process can commit in between. The store lock is only taken
+        once the database write lock is held, so reads aren't held up while
+        another process has it."""
+        self._load()
+        if not self.shared:
+            yield
+            return
+        with self._db_lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            self._transaction_writes = []
+            try:
+                self._refresh()
+                yield
+                # Read before committing: once the write lock is released
+                # another process may take the next revision
+                rev = db.execute("SELECT MAX(rev) FROM submissions").fetchone()[0] or 0
+                db.execute("COMMIT")
+            except BaseException:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self._undo(self._transaction_writes)
+                raise
+            finally:
+                self._transaction_writes = []
+            # Every revision up to rev is either ours or already applied
+            with self.lock:
+                self._rev = rev
+
+    def _snapshot(self, submission_id):
+        submission = self.get(submission_id)
+        return submission.to_dict() if submission is not None else None
+
+    def _undo(self, writes):
+        """Put back in memory the submissions that writes failed to commit,
+        unless they have changed again since"""
+        first, last = {}, {}
+        for write in writes:
+            first.setdefault(write.submission_id, write)
+            last[write.submission_id] = write
+        with self.lock:
+            for submission_id, write in first.items():
+                if self.version_of(submission_id) != last[submission_id].version:
+                    continue
+                if write.previous is None:
+                    self._remove(submission_id)
+                else:
+                    self._replace(write.previous)
+
+    def _persist(self, write):
+        self._persist_many([write])
+
+    def _persist_many(self, writes):
+        if not writes:
+            return
+        if self.shared:
+            # Committed by the enclosing _writing() transaction
+            self._transaction_writes.extend(writes)
+            self._write_rows(*self._batch_rows(writes))
+            return
+        with self._pending_ready:
+            self._pending.extend(writes)
+            self._last_write = writes[-1]
+            self._pending_ready.notify()
+        if self.wait_for_commit:
+            for write in writes:
+                write.done.wait()
+                if write.error is not None:
+                    raise write.error
+
+    def _write_loop(self):
+        while True:
+            with self._pending_ready:
+                self._pending_ready.wait_for(lambda: self._pending)
+            # Give concurrent requests a moment to join this batch
+            deadline = time.monotonic() + self.batch_window
+            while time.monotonic() < deadline:
+                with self._pending_ready:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                time.sleep(self.batch_window / 5)
+            with self._pending_ready:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            self._commit(batch)
+
+    def _batch_rows(self, batch):
+        """(submission rows, history rows) to write for a batch"""
+        # Only the latest snapshot of each submission needs writing
+        latest = {}
+        for write in batch:
+            latest[write.submission_id] = write.data
+        with self.lock:
+            rows = [(submission_id, self._seq[submission_id], data) for submission_id, data in latest.items()]
+        history = [(w.submission_id, w.event, w.payload, w.recorded_at) for w in batch if w.event]
+        return rows, history
+
+    def _write_rows(self, rows, history):
+        self._db.executemany(
+            "INSERT INTO submissions (id, seq, data, rev) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(rev), 0) + 1 FROM submissions)) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data, rev = excluded.rev",
+            rows
+        )
+        self._db.executemany(
+            "INSERT INTO grade_history (submission_id, event, payload, recorded_at) VALUES (?, ?, ?, ?)",
+            history
+        )
+
+    def _commit(self, batch):
+        # Whatever goes wrong is handed to the batch's callers, so that the
+        # writer thread carries on and nobody waits on a write forever
+        error = None
+        try:
+            rows, history = self._batch_rows(batch)
+            with self._db_lock:
+                db = self._db
+                try:
+                    db.execute("BEGIN")
+                    self._write_rows(rows, history)
+                    db.execute("COMMIT")
+                except BaseException:
+                    if db.in_transaction:
+                        db.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            error = e
+            try:
+                self._undo(batch)
+            except Exception:
+                # Memory can't be put back; callers still get the commit's error
+                pass
+        finally:
+            for write in batch:
+                write.error = error
+                write.done.set()
@@ -0,0 +1,286 @@
+"""
+In-memory submission store for the grading API.
+Submissions are indexed by id, with secondary indexes by status,
+assignment type and student id so lookups don't scan the whole roster.
+Each submission is held as a compact Submission record (see _records.py).
+"""
+
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+from _records import Submission
+
+INDEXED_FIELDS = ('status', 'assignment_type', 'student_id')
+
+# Changes remembered for delta sync; clients further behind must resync
+CHANGE_LOG_SIZE = 10000
+
+
+class SubmissionStore:
+    """Submissions keyed by id, kept in insertion order.
+
+    add() takes submission dicts and stores them as Submission records,
+    which is what every read returns. Reads and writes go through `lock`,
+    which callers should also hold while serializing submissions that
+    grading workers may be updating.
+    """
+
+    def __init__(self, submissions=(), change_log_size=CHANGE_LOG_SIZE):
+        self.lock = threading.RLock()
+        self._by_id = {}
+        self._seq = {}
+        self._rows = []
+        # field -> value -> sorted list of row sequence numbers
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        # Bumped on every change; each submission remembers the version it
+        # last changed at so cached responses can be validated cheaply
+        self._version = 0
+        self._versions = {}
+        # (version, submission id) for the most recent changes; versions
+        # are consecutive. The epoch tells clients when versions restarted.
+        self._changes = deque(maxlen=change_log_size)
+        self.epoch = os.urandom(4).hex()
+        self._grade_listeners = []
+        for submission in submissions:
+            self.add(submission)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, submission_id):
+        return submission_id in self._by_id
+
+    def get(self, submission_id):
+        return self._by_id.get(submission_id)
+
+    @property
+    def version(self):
+        return self._version
+
+    def version_of(self, submission_id):
+        return self._versions.get(submission_id)
+
+    def add(self, submission):
+        with self.lock:
+            return self._insert(submission)
+
+    def add_many(self, submissions):
+        """Add submissions in one locked pass, skipping ids already present.
+        Returns (added records, skipped ids)."""
+        added = []
+        skipped = []
+        with self.lock:
+            for submission in submissions:
+                if submission['id'] in self._by_id:
+                    skipped.append(submission['id'])
+                else:
+                    added.append(self._insert(submission))
+        return added, skipped
+
+    def add_grade_listener(self, listener):
+        """Call listener(assignment_type, old_scores, new_scores) under the
+        lock whenever a submission's question scores change, where scores
+        are lists of (question id, max points, score). Submissions already
+        graded are replayed to the listener first."""
+        with self.lock:
+            self._grade_listeners.append(listener)
+            for submission in self._rows:
+                scores = submission.graded_scores()
+                if scores:
+                    listener(submission.get('assignment_type'), [], scores)
+
+    def all(self):
+        with self.lock:
+            return list(self._rows)
+
+    def find(self, **filters):
+        """Return submissions matching every field=value filter, in insertion order"""
+        return self.page(**filters)[0]
+
+    def page(self, after=None, limit=None, **filters):
+        """Return (rows, cursor) for up to `limit` submissions matching the
+        filters whose sequence number is greater than `after`. The cursor is
+        the sequence number of the last row returned, or None when no
+        further rows match."""
+        with self.lock:
+            filters = {field: value for field, value in filters.items() if value is not None}
+            for field in filters:
+                if field not in self._indexes:
+                    raise KeyError(f"Field is not indexed: {field}")
+
+            if filters:
+                # Walk the smallest bucket and check the remaining filters per row
+                seqs = min((self._indexes[field].get(value, []) for field, value in filters.items()), key=len)
+                start = bisect_right(seqs, after) if after is not None else 0
+            else:
+                seqs = range(len(self._rows))
+                start = after + 1 if after is not None else 0
+
+            rows = []
+            check = len(filters) > 1
+            for i in range(max(start, 0), len(seqs)):
+                row = self._rows[seqs[i]]
+                if check and not all(getattr(row, field, None) == value for field, value in filters.items()):
+                    continue
+                if limit is not None and len(rows) == limit:
+                    return rows, self._seq[rows[-1].id]
+                rows.append(row)
+            return rows, None
+
+    def feed_position(self):
+        """(epoch, version) of the latest change, for change feed clients to
+        resume from with changed_since"""
+        return self.epoch, self._version
+
+    def changed_since(self, version, **filters):
+        """Return (rows, removed ids) for submissions changed after version:
+        rows still match every field=value filter, removed ones no longer
+        do or are gone. Returns None when the change log doesn't reach back to version.
+        Cost is proportional to the number of changes, not the roster."""
+        with self.lock:
+            if version > self._version:
+                return None
+            if version == self._version:
+                return [], []
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            # Newest first, keeping each submission's latest change
+            latest = {}
+            for changed_at, submission_id in reversed(self._changes):
+                if changed_at <= version:
+                    break
+                latest.setdefault(submission_id, changed_at)
+            rows = []
+            removed = []
+            for submission_id in reversed(list(latest)):
+                row = self._by_id.get(submission_id)
+                if row is not None and all(getattr(row, field, None) == value for field, value in filters.items() if value is not None):
+                    rows.append(row)
+                else:
+                    removed.append(submission_id)
+            return rows, removed
+
+    def set_status(self, submission_id, status):
+        with self.lock:
+            submission = self._by_id.get(submission_id)
+            if submission is None:
+                return None
+            if getattr(submission, 'status', None) != status:
+                self._reindex(submission, 'status', status)
+                self._touch(submission_id)
+            return submission
+
+    def record_grade(self, submission_id, result):
+        """Store AI grading results on the submission and mark it graded"""
+        with self.lock:
+            submission = self._by_id.get(submission_id)
+            if submission is None:
+                return None
+            old_scores = submission.graded_scores() if self._grade_listeners else None
+            submission.total_score = result['total_score']
+            submission.max_total = result['max_total']
+            submission.percentage = result['percentage']
+            submission.graded_at = result.get('graded_at', '2024-01-16T14:20:00Z')
+
+            # Update questions with scores and feedback
+            questions = submission.question_dicts()
+            for i, question in enumerate(questions):
+                if i < len(result['questions']):
+                    graded_q = result['questions'][i]
+                    question['score'] = graded_q['score']
+                    question['feedback'] = graded_q['feedback']
+            submission['questions'] = questions
+            if old_scores is not None:
+                self._notify_grade(submission, old_scores)
+
+            self._reindex(submission, 'status', 'graded')
+            self._touch(submission_id)
+            return submission
+
+    def _insert(self, submission):
+        submission = Submission.from_dict(submission)
+        submission_id = submission['id']
+        if submission_id in self._by_id:
+            raise ValueError(f"Duplicate submission id: {submission_id}")
+        seq = len(self._rows)
+        self._rows.append(submission)
+        self._by_id[submission_id] = submission
+        self._seq[submission_id] = seq
+        for field in INDEXED_FIELDS:
+            self._index_add(field, submission.get(field), seq)
+        if self._grade_listeners:
+            self._notify_grade(submission, [])
+        self._touch(submission_id)
+        return submission
+
+    def _replace(self, submission):
+        """Overwrite a stored submission with a newer copy of it, such as
+        one committed by another process sharing the same database"""
+        submission = Submission.from_dict(submission)
+        submission_id = submission.id
+        previous = self._by_id[submission_id]
+        seq = self._seq[submission_id]
+        for field in INDEXED_FIELDS:
+            old_value, value = previous.get(field), submission.get(field)
+            if old_value != value:
+                self._index_remove(field, old_value, seq)
+                self._index_add(field, value, seq)
+        self._rows[seq] = submission
+        self._by_id[submission_id] = submission
+        if self._grade_listeners:
+            self._notify_grade(submission, previous.graded_scores())
+        self._touch(submission_id)
+        return submission
+
+    def _remove(self, submission_id):
+        """Drop a submission, such as one whose insert failed to persist.
+        Later rows move up a place, so this rebuilds the indexes."""
+        submission = self._by_id.pop(submission_id)
+        seq = self._seq.pop(submission_id)
+        del self._rows[seq]
+        for i in range(seq, len(self._rows)):
+            self._seq[self._rows[i].id] = i
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        for i, row in enumerate(self._rows):
+            for field in INDEXED_FIELDS:
+                self._indexes[field].setdefault(row.get(field), []).append(i)
+        old_scores = submission.graded_scores() if self._grade_listeners else None
+        if old_scores:
+            for listener in self._grade_listeners:
+                listener(submission.get('assignment_type'), old_scores, [])
+        self._touch(submission_id)
+        del self._versions[submission_id]
+
+    def _notify_grade(self, submission, old_scores):
+        new_scores = submission.graded_scores()
+        if old_scores or new_scores:
+            for listener in self._grade_listeners:
+                listener(submission.get('assignment_type'), old_scores, new_scores)
+
+    def _touch(self, submission_id):
+        self._version += 1
+        self._versions[submission_id] = self._version
+        self._changes.append((self._version, submission_id))
+
+    def _reindex(self, submission, field, value):
+        old_value = submission.get(field)
+        if old_value != value:
+            seq = self._seq[submission.id]
+            self._index_remove(field, old_value, seq)
+            self._index_add(field, value, seq)
+        submission[field] = value
+
+    def _index_add(self, field, value, seq):
+        insort(self._indexes[field].setdefault(value, []), seq)
+
+    def _index_remove(self, field, value, seq):
+        bucket = self._indexes[field].get(value)
+        if not bucket:
+            return
+        i = bisect_left(bucket, seq)
+        if i < len(bucket) and bucket[i] == seq:
+            del bucket[i]
+        if not bucket:
+            del self._indexes[field][value]
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+asyncio HTTP/1.1 front end for the local API server.
+Connections are persistent (keep-alive) and requests on a connection are
+parsed and answered strictly in order, so pipelined requests are safe.
+Each request is dispatched to a BaseHTTPRequestHandler subclass running in
+a bounded thread pool, so the same handler serves both server modes.
+Server-Sent Events requests, which hold their thread for as long as the
+stream lasts, get a pool of their own.
+Small request bodies are read before dispatch; larger ones are streamed to
+the handler as it reads them.
+"""
+
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024 * 1024
+# Bodies up to this size are buffered before the handler runs
+BUFFERED_BODY_BYTES = 256 * 1024
+
+
+class _Server:
+    """Stand-in for the socketserver instance handlers can reach as self.server"""
+
+    def __init__(self, server_address):
+        self.server_address = server_address
+
+
+class _ResponseWriter:
+    """File-like wfile for a handler running in a worker thread.
+
+    Buffers until the header block is complete, then decides how the body
+    is framed: responses with a Content-Length (or no body) are passed
+    through, other HTTP/1.1 responses are sent with chunked transfer
+    encoding, and anything else is delimited by closing the connection.
+    Every write waits for the transport to drain, which gives streaming
+    handlers backpressure.
+    """
+
+    def __init__(self, loop, writer, request_version, head_only=False):
+        self.loop = loop
+        self.writer = writer
+        self.request_version = request_version
+        self.head_only = head_only
+        self.chunked = False
+        self.close_delimited = False
+        self.started = False
+        self._head = b''
+
+    def write(self, data):
+        if not data:
+            return 0
+        if self.started:
+            self._send_body(data)
+            return len(data)
+        self._head += data
+        end = self._head.find(b'\r\n\r\n')
+        if end < 0:
+            return len(data)
+        head, rest = self._head[:end + 2], self._head[end + 4:]
+        self._head = b''
+        self.started = True
+        self._send(self._frame(head))
+        if rest:
+            self._send_body(rest)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    async def finish(self):
+        """Terminate the response from the event loop; returns False if the
+        connection must close"""
+        if not self.started:
+            return False
+        if self.chunked:
+            await self._write_and_drain(b'0\r\n\r\n')
+        return not self.close_delimited
+
+    def _frame(self, head):
+        lines = head.split(b'\r\n')
+        status = int(lines[0].split(b' ', 2)[1])
+        names = {line.split(b':', 1)[0].strip().lower() for line in lines[1:] if b':' in line}
+        bodyless = self.head_only or status in (204, 304) or 100 <= status < 200
+        extra = []
+        if b'content-length' not in names and b'transfer-encoding' not in names and not bodyless:
+            if self.request_version == 'HTTP/1.1':
+                self.chunked = True
+                extra.append(b'Transfer-Encoding: chunked')
+            else:
+                self.close_delimited = True
+        if self.close_delimited and b'connection' not in names:
+            extra.append(b'Connection: close')
+        return b'\r\n'.join(line for line in lines + extra if line) + b'\r\n\r\n'
+
+    def _send_body(self, data):
+        if self.head_only:
+            return
+        if self.chunked:
+            data = b'%x\r\n%s\r\n' % (len(data), data)
+        self._send(data)
+
+    def _send(self, data):
+        asyncio.run_coroutine_threadsafe(self._write_and_drain(data), self.loop).result()
+
+    async def _write_and_drain(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+class _StreamedRequest(io.RawIOBase):
+    """Raw rfile for a handler in a worker thread: the buffered request head,
+    then up to `length` body bytes read from the connection on demand"""
+
+    def __init__(self, loop, reader, head, length, timeout):
+        self.loop = loop
+        self.reader = reader
+        self.head = memoryview(head)
+        self.remaining = length
+        self.timeout = timeout
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.head:
+            n = min(len(buffer), len(self.head))
+            buffer[:n] = self.head[:n]
+            self.head = self.head[n:]
+            return n
+        if self.remaining <= 0:
+            return 0
+        data = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(self.reader.read(min(len(buffer), self.remaining)), self.timeout), self.loop
+        ).result()
+        if not data:
+            # Client went away mid-body: report end of file, as a socket
+            # rfile would, and let the connection close afterwards
+            return 0
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _UnsupportedBody(Exception):
+    """The request body uses a framing this server doesn't read"""
+
+
+def _content_length(head):
+    """Content-Length of a request head; raises ValueError if malformed and
+    _UnsupportedBody for chunked bodies"""
+    length = None
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'transfer-encoding':
+            raise _UnsupportedBody("Chunked request bodies are not supported")
+        if name == b'content-length':
+            value = int(value.strip())
+            if value < 0 or (length is not None and value != length):
+                raise ValueError("Invalid Content-Length")
+            length = value
+    return length or 0
+
+
+def _accepts_event_stream(head):
+    """True if a request head's Accept header asks for Server-Sent Events"""
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'accept' and b'text/event-stream' in value.lower():
+            return True
+    return False
+
+
+class AsyncHTTPServer:
+    """Serve a BaseHTTPRequestHandler subclass over asyncio with keep-alive.
+
+    max_connections caps open client connections (extra connections get a
+    503 and are closed); concurrency caps requests being handled at once;
+    keep_alive_timeout closes connections idle for that many seconds.
+    Requests that accept text/event-stream run in a separate pool of
+    max_streams threads instead, so long-lived streams can't take every
+    worker; a stream request beyond that gets a 503.
+    reuse_port binds with SO_REUSEPORT so several processes can accept on
+    the same port.
+    """
+
+    def __init__(self, handler_class, host='', port=5001, max_connections=256,
+                 concurrency=32, keep_alive_timeout=15, reuse_port=False, max_streams=64):
+        self.handler_class = handler_class
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.max_connections = max_connections
+        self.keep_alive_timeout = keep_alive_timeout
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='http-worker')
+        self.max_streams = max_streams
+        self.stream_executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix='http-stream')
+        self.connections = 0
+        self.streams = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._serve_connection, self.host or None, self.port, limit=MAX_HEADER_BYTES,
+            reuse_port=self.reuse_port or None
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def shutdown(self, timeout=5):
+        """Stop accepting connections and wait up to timeout seconds for open
+        ones to finish"""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.connections and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def _serve_connection(self, reader, writer):
+        if self.connections >= self.max_connections:
+            writer.write(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n'
+                         b'Retry-After: 1\r\nConnection: close\r\n\r\n')
+            await self._close(writer)
+            return
+        self.connections += 1
+        try:
+            while await self._serve_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            await self._close(writer)
+
+    async def _serve_request(self, reader, writer):
+        """Read and answer one request; returns True to keep the connection"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keep_alive_timeout)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.IncompleteReadError:
+            return False
+        except asyncio.LimitOverrunError:
+            await self._reject(writer, 431, 'Request Header Fields Too Large')
+            return False
+
+        # Tolerate stray CRLFs between pipelined requests
+        head = head.lstrip(b'\r\n')
+        if not head.strip():
+            return True
+
+        try:
+            length = _content_length(head)
+        except _UnsupportedBody:
+            await self._reject(writer, 501, 'Not Implemented')
+            return False
+        except ValueError:
+            await self._reject(writer, 400, 'Bad Request')
+            return False
+        if length > MAX_BODY_BYTES:
+            await self._reject(writer, 413, 'Payload Too Large')
+            return False
+
+        request_line = head.split(b'\r\n', 1)[0].split()
+        if len(request_line) != 3 or not request_line[2].startswith(b'HTTP/'):
+            await self._reject(writer, 400, 'Bad Request')
+            return False
+        request_version = request_line[2].decode('latin-1')
+        head_only = request_line[0] == b'HEAD'
+        stream = _accepts_event_stream(head)
+        if stream and self.streams >= self.max_streams:
+            await self._reject(writer, 503, 'Service Unavailable')
+            return False
+
+        loop = asyncio.get_running_loop()
+        if length <= BUFFERED_BODY_BYTES:
+            body = await reader.readexactly(length) if length else b''
+            rfile = io.BytesIO(head + body)
+            streamed = None
+        else:
+            streamed = _StreamedRequest(loop, reader, head, length, self.keep_alive_timeout)
+            rfile = io.BufferedReader(streamed, 64 * 1024)
+        wfile = _ResponseWriter(loop, writer, request_version, head_only)
+        peer = writer.get_extra_info('peername') or ('', 0)
+        if stream:
+            self.streams += 1
+        try:
+            keep_open = await loop.run_in_executor(
+                self.stream_executor if stream else self.executor, self._handle, rfile, wfile, peer[:2]
+            )
+        finally:
+            if stream:
+                self.streams -= 1
+        if streamed is not None and streamed.remaining:
+            # The handler left part of the body unread; the connection can't
+            # be reused without reading it
+            keep_open = False
+        return await wfile.finish() and keep_open
+
+    def _handle(self, rfile, wfile, client_address):
+        """Run the handler for one request in a worker thread"""
+        handler = self.handler_class.__new__(self.handler_class)
+        handler.protocol_version = 'HTTP/1.1'
+        handler.client_address = client_address
+        handler.server = _Server((self.host, self.port))
+        handler.request = None
+        handler.rfile = rfile
+        handler.wfile = wfile
+        handler.close_connection = True
+        try:
+            handler.handle_one_request()
+        except Exception:
+            handler.log_error('Unhandled error serving %r', handler.path if hasattr(handler, 'path') else '')
+            if not wfile.started:
+                wfile.write(b'HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n'
+                            b'Connection: close\r\n\r\n')
+            return False
+        return not handler.close_connection
+
+    async def _reject(self, writer, status, reason):
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        await writer.drain()
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def run_async_server(handler_class, port=5001, **options):
+    server = AsyncHTTPServer(handler_class, port=port, **options)
+    asyncio.run(server.serve_forever())
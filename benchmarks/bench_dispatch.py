@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-request dispatch overhead.
+
+Runs requests through the API handler entirely in memory (no sockets) and
+compares it with a copy of the original handler, which split the path and
+walked a chain of comparisons, then wrote each header with send_header.
+
+    python benchmarks/bench_dispatch.py [--iterations N]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from grade import SUBMISSION_STORE, handler
+
+REQUESTS = [
+    ('GET /api/submissions/{id}', b'GET /api/submissions/sub_003 HTTP/1.1\r\nHost: bench\r\n\r\n'),
+    ('GET unknown route', b'GET /api/unknown/route HTTP/1.1\r\nHost: bench\r\n\r\n'),
+    ('POST /api/submissions/{id}/release', b'POST /api/submissions/sub_003/release HTTP/1.1\r\nHost: bench\r\n\r\n'),
+    ('OPTIONS preflight', b'OPTIONS /api/submissions HTTP/1.1\r\nHost: bench\r\n\r\n'),
+]
+
+
+class LegacyHandler(BaseHTTPRequestHandler):
+    """The original routing and response writing, against the same store"""
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.end_headers()
+
+    def do_GET(self):
+        parsed_path = urlparse(self.path)
+        path_parts = parsed_path.path.strip('/').split('/')
+
+        if path_parts[0] == 'api':
+            if len(path_parts) == 3 and path_parts[1] == 'submissions':
+                submission = SUBMISSION_STORE.get(path_parts[2])
+                if submission:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(json.dumps(submission.to_dict()).encode())
+                    return
+
+        self.send_response(404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": "Not found"}).encode())
+
+    def do_POST(self):
+        parsed_path = urlparse(self.path)
+        path_parts = parsed_path.path.strip('/').split('/')
+
+        if path_parts[0] == 'api':
+            if len(path_parts) == 4 and path_parts[1] == 'submissions' and path_parts[3] == 'grade':
+                pass
+            elif len(path_parts) == 4 and path_parts[1] == 'submissions' and path_parts[3] == 'release':
+                submission = SUBMISSION_STORE.get(path_parts[2])
+                if submission:
+                    SUBMISSION_STORE.set_status(path_parts[2], 'released')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(json.dumps({"message": "Grades released successfully"}).encode())
+                    return
+
+        self.send_response(404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": "Not found"}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(handler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parsed_handler(handler_class, raw_request):
+    """A handler instance with the request line and headers already parsed"""
+    h = handler_class.__new__(handler_class)
+    h.rfile = io.BytesIO(raw_request)
+    h.wfile = io.BytesIO()
+    h.client_address = ('127.0.0.1', 0)
+    h.server = None
+    h.request = None
+    h.close_connection = True
+    h.raw_requestline = h.rfile.readline()
+    h.parse_request()
+    return h
+
+
+def bench_request(handler_class, raw_request, iterations):
+    """µs per request including request line and header parsing"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        h = handler_class.__new__(handler_class)
+        h.rfile = io.BytesIO(raw_request)
+        h.wfile = io.BytesIO()
+        h.client_address = ('127.0.0.1', 0)
+        h.server = None
+        h.request = None
+        h.close_connection = True
+        h.handle_one_request()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_dispatch(handler_class, raw_request, iterations):
+    """µs per request for routing and response writing only"""
+    h = parsed_handler(handler_class, raw_request)
+    method = getattr(h, 'do_' + h.command)
+    method()  # warm up caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        h.wfile = io.BytesIO()
+        method()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    for title, bench in (("routing + response writing", bench_dispatch), ("full request", bench_request)):
+        print(f"\n{title}")
+        print(f"{'request':<38}{'before (µs)':>12}{'after (µs)':>12}{'speedup':>10}")
+        for name, raw_request in REQUESTS:
+            before = bench(LegacyHandler, raw_request, args.iterations)
+            after = bench(QuietHandler, raw_request, args.iterations)
+            print(f"{name:<38}{before:>12.2f}{after:>12.2f}{before / after:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+End-to-end API benchmark on a synthetic roster.
+
+Serves a generated roster through grade.handler and local_server's
+LocalAPIHandler, both in-process (requests parsed from memory, no sockets)
+and over local sockets with the asyncio and threaded servers, and reports
+throughput and p50/p99 latency for list, detail, grade and release.
+
+    python benchmarks/bench_e2e.py --submissions 100000 --output results.json
+    python benchmarks/bench_e2e.py --baseline results.json
+
+Each handler/transport pair gets a fresh store, caches and grader over the
+same roster, so grading starts cold for every pair.
+"""
+
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, ROOT)
+from _analytics import GradingAnalytics
+from _api import GradingAPI
+from _cache import ResponseCache
+from _grading import GradingCache
+from _jobs import JobQueue
+from _metrics import Metrics
+from _store import SubmissionStore
+from async_server import AsyncHTTPServer
+from grade import RUBRICS, handler
+from local_server import LocalAPIHandler
+from roster import generate_roster
+
+OPERATIONS = ('list', 'detail', 'grade', 'release')
+HANDLERS = {'handler': handler, 'LocalAPIHandler': LocalAPIHandler}
+TRANSPORTS = ('inprocess', 'async', 'threaded')
+
+
+def build_api(submissions):
+    metrics = Metrics()
+    grader = GradingCache(metrics=metrics)
+    store = SubmissionStore(submissions)
+    analytics = GradingAnalytics(RUBRICS)
+    store.add_grade_listener(analytics.update)
+    return GradingAPI(store, ResponseCache(), JobQueue(backend=grader), grader, metrics, RUBRICS, analytics)
+
+
+def bind(handler_class, api):
+    """handler_class serving api, without the access log"""
+    return type(handler_class.__name__, (handler_class,), {'api': api, 'access_log': False})
+
+
+def make_requests(op, count, ids, assignment_types, rng):
+    """(method, path) pairs for one operation"""
+    if op == 'list':
+        return [('GET', f"/api/submissions?assignment_type={rng.choice(assignment_types)}"
+                        f"&limit=50&cursor={rng.randrange(len(ids))}") for _ in range(count)]
+    if op == 'detail':
+        return [('GET', f"/api/submissions/{rng.choice(ids)}") for _ in range(count)]
+    return [('POST', f"/api/submissions/{rng.choice(ids)}/{op}") for _ in range(count)]
+
+
+def run_inprocess(handler_class, requests):
+    """Latencies (s) and error count, one handler instance per request"""
+    latencies = []
+    errors = 0
+    for method, path in requests:
+        raw = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: 0\r\n\r\n".encode()
+        start = time.perf_counter()
+        h = handler_class.__new__(handler_class)
+        h.rfile = io.BytesIO(raw)
+        h.wfile = io.BytesIO()
+        h.client_address = ('127.0.0.1', 0)
+        h.server = None
+        h.request = None
+        h.close_connection = True
+        h.handle_one_request()
+        latencies.append(time.perf_counter() - start)
+        if not h.wfile.getvalue().split(b' ', 2)[1].startswith(b'2'):
+            errors += 1
+    return latencies, errors
+
+
+def run_clients(port, requests, concurrency):
+    """Send requests from `concurrency` keep-alive clients; latencies and errors"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(share):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        mine = []
+        failed = 0
+        for method, path in share:
+            start = time.perf_counter()
+            conn.request(method, path, body=b'' if method == 'POST' else None)
+            response = conn.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - start)
+            if response.status >= 300:
+                failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(requests[i::concurrency],)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+class _AsyncServerThread:
+    def __init__(self, handler_class, concurrency):
+        self.server = AsyncHTTPServer(handler_class, host='127.0.0.1', port=0,
+                                      concurrency=concurrency, max_connections=concurrency * 4)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.server.start())
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait()
+        self.port = self.server.port
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.server.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.server.executor.shutdown()
+
+
+class _ThreadedServerThread:
+    def __init__(self, handler_class, concurrency):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+SERVERS = {'async': _AsyncServerThread, 'threaded': _ThreadedServerThread}
+
+
+def summarize(handler_name, transport, op, latencies, errors, seconds):
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    return {
+        "handler": handler_name,
+        "transport": transport,
+        "op": op,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(0.50), 3),
+        "p99_ms": round(percentile(0.99), 3),
+    }
+
+
+def run_target(handler_name, transport, submissions, args):
+    ids = [s['id'] for s in submissions]
+    assignment_types = sorted({s['assignment_type'] for s in submissions})
+    handler_class = bind(HANDLERS[handler_name], build_api(submissions))
+    server = SERVERS[transport](handler_class, args.concurrency) if transport in SERVERS else None
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        for op in args.ops:
+            warmup = make_requests(op, min(100, args.requests // 10), ids, assignment_types, rng)
+            requests = make_requests(op, args.requests, ids, assignment_types, rng)
+            if server is None:
+                run_inprocess(handler_class, warmup)
+                start = time.perf_counter()
+                latencies, errors = run_inprocess(handler_class, requests)
+            else:
+                run_clients(server.port, warmup, args.concurrency)
+                start = time.perf_counter()
+                latencies, errors = run_clients(server.port, requests, args.concurrency)
+            results.append(summarize(handler_name, transport, op, latencies, errors,
+                                     time.perf_counter() - start))
+    finally:
+        if server is not None:
+            server.close()
+    return results
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r['handler'], r['transport'], r['op']): r for r in baseline['results']}
+    header = f"{'handler':<17}{'transport':<11}{'op':<9}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    if previous:
+        header += f"{'vs base':>9}"
+    print(header)
+    for r in results:
+        line = (f"{r['handler']:<17}{r['transport']:<11}{r['op']:<9}{r['throughput_rps']:>10.0f}"
+                f"{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['errors']:>8}")
+        base = previous.get((r['handler'], r['transport'], r['op']))
+        if base:
+            line += f"{r['throughput_rps'] / base['throughput_rps']:>8.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=10000, help="roster size (default: 10000)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.3)
+    parser.add_argument('--requests', type=int, default=2000, help="timed requests per operation")
+    parser.add_argument('--concurrency', type=int, default=8, help="socket clients sending at once")
+    parser.add_argument('--handlers', default=','.join(HANDLERS))
+    parser.add_argument('--transports', default=','.join(TRANSPORTS))
+    parser.add_argument('--ops', default=','.join(OPERATIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare throughput against a previous --output file")
+    args = parser.parse_args()
+    args.ops = args.ops.split(',')
+
+    start = time.perf_counter()
+    submissions = list(generate_roster(args.submissions, args.duplicate_rate, args.seed))
+    print(f"Generated {len(submissions)} submissions in {time.perf_counter() - start:.1f}s")
+
+    results = []
+    for handler_name in args.handlers.split(','):
+        for transport in args.transports.split(','):
+            results.extend(run_target(handler_name, transport, submissions, args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "submissions": args.submissions,
+                "duplicate_rate": args.duplicate_rate,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "recorded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Resident memory of a roster held as plain dicts versus in SubmissionStore.
+
+Each representation is measured in its own process: the roster is
+generated and encoded to JSON lines first, then decoded (as it would be
+from a file or the database) and held, and the growth in resident memory
+is reported. The store figure includes its indexes; the dict figure is
+the bare list, so the ratio is a lower bound.
+
+    python benchmarks/bench_memory.py [--submissions 100000] [--duplicate-rate 0.3]
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _store import SubmissionStore
+from roster import generate_roster
+
+MODES = ('dicts', 'store')
+
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        # Peak rather than current RSS, which is close enough while memory only grows
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def measure(mode, count, duplicate_rate, seed):
+    lines = [json.dumps(s) for s in generate_roster(count, duplicate_rate, seed)]
+    gc.collect()
+    before = resident_bytes()
+    if mode == 'dicts':
+        held = [json.loads(line) for line in lines]
+    else:
+        held = SubmissionStore(json.loads(line) for line in lines)
+    gc.collect()
+    grown = resident_bytes() - before
+    assert len(held) == count
+    return grown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=100000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(measure(args.mode, args.submissions, args.duplicate_rate, args.seed))
+        return
+
+    grown = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode,
+             '--submissions', str(args.submissions), '--duplicate-rate', str(args.duplicate_rate),
+             '--seed', str(args.seed)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        grown[mode] = int(output.split()[-1])
+
+    print(f"{args.submissions} submissions, duplicate rate {args.duplicate_rate}")
+    print(f"{'representation':<16}{'resident MB':>13}{'bytes/submission':>18}")
+    for mode in MODES:
+        print(f"{mode:<16}{grown[mode] / 2**20:>13.1f}{grown[mode] / args.submissions:>18.0f}")
+    print(f"reduction: {grown['dicts'] / grown['store']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
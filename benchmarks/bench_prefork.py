@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Throughput of local_server.py --workers N as N grows.
+
+For each worker count a fresh SQLite database is seeded with a synthetic
+roster, the server is started with that many prefork workers, and client
+processes send requests over keep-alive connections for a fixed time per
+operation. Throughput, p50/p99 latency and the speedup over one worker
+are reported.
+
+    python benchmarks/bench_prefork.py --workers 1,2,4,8 --output prefork.json
+
+Reads (detail, list) scale with the number of cores. Writes (grade,
+release) are serialized by the database's write lock. Clients run on the
+same machine, so leave cores free for them: on a box with C cores, worker
+counts up to about C/2 are meaningful.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+from _sqlite_store import SQLiteSubmissionStore
+from roster import generate_roster
+
+OPERATIONS = ('detail', 'list', 'grade', 'release')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_database(path, submissions):
+    store = SQLiteSubmissionStore(path, seed=submissions)
+    len(store)
+    store.close()
+
+
+def start_server(workers, port, db_path, mode):
+    env = dict(os.environ, GRADE_STORE='sqlite', GRADE_DB_PATH=db_path)
+    proc = subprocess.Popen(
+        [sys.executable, 'local_server.py', '--workers', str(workers), '--port', str(port),
+         '--mode', mode, '--no-access-log'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def make_request(op, ids, assignment_types, rng):
+    if op == 'list':
+        return 'GET', (f"/api/submissions?assignment_type={rng.choice(assignment_types)}"
+                       f"&limit=50&cursor={rng.randrange(len(ids))}")
+    if op == 'detail':
+        return 'GET', f"/api/submissions/{rng.choice(ids)}"
+    return 'POST', f"/api/submissions/{rng.choice(ids)}/{op}"
+
+
+def client(port, op, ids, assignment_types, seconds, seed, results):
+    """Send requests on one keep-alive connection until time runs out"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while True:
+        method, path = make_request(op, ids, assignment_types, rng)
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        conn.request(method, path, body=b'' if method == 'POST' else None)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 300:
+            errors += 1
+    conn.close()
+    results.put((latencies, errors))
+
+
+def run_load(port, op, ids, assignment_types, clients, seconds, seed):
+    """(latencies, errors, elapsed seconds) from `clients` client processes"""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=client,
+                                 args=(port, op, ids, assignment_types, seconds, seed + i, results))
+                 for i in range(clients)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies = []
+    errors = 0
+    for _ in processes:
+        mine, failed = results.get()
+        latencies.extend(mine)
+        errors += failed
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return latencies, errors, elapsed
+
+
+def summarize(workers, op, latencies, errors, seconds):
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "workers": workers,
+        "op": op,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(0.50), 3),
+        "p99_ms": round(percentile(0.99), 3),
+    }
+
+
+def print_results(results):
+    single = {r['op']: r['throughput_rps'] for r in results if r['workers'] == 1}
+    print(f"{'workers':>7}  {'op':<9}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'speedup':>9}")
+    for r in results:
+        line = (f"{r['workers']:>7}  {r['op']:<9}{r['throughput_rps']:>10.0f}{r['p50_ms']:>9.3f}"
+                f"{r['p99_ms']:>9.3f}{r['errors']:>8}")
+        if single.get(r['op']):
+            line += f"{r['throughput_rps'] / single[r['op']]:>8.2f}x"
+        print(line)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2} | {n for n in (4, 8, 16) if n <= max(cores // 2, 1)})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help="comma-separated worker counts (default: powers of two up to half the cores)")
+    parser.add_argument('--submissions', type=int, default=10000, help="roster size (default: 10000)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.3)
+    parser.add_argument('--clients', type=int, default=max(4, cores),
+                        help="client processes, one connection each (default: max(4, cores))")
+    parser.add_argument('--seconds', type=float, default=3.0, help="load time per operation")
+    parser.add_argument('--ops', default='detail,list,grade')
+    parser.add_argument('--mode', choices=['async', 'threaded'], default='async', help="server in each worker")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+    worker_counts = [int(n) for n in args.workers.split(',')]
+    ops = args.ops.split(',')
+    for op in ops:
+        if op not in OPERATIONS:
+            parser.error(f"unknown op: {op}")
+
+    submissions = list(generate_roster(args.submissions, args.duplicate_rate, args.seed))
+    ids = [s['id'] for s in submissions]
+    assignment_types = sorted({s['assignment_type'] for s in submissions})
+    print(f"{len(submissions)} submissions, {args.clients} clients, {cores} cores")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            db_path = os.path.join(tmp, f'workers-{workers}.db')
+            seed_database(db_path, submissions)
+            port = free_port()
+            server = start_server(workers, port, db_path, args.mode)
+            try:
+                # Every worker loads the database on its first request
+                run_load(port, 'detail', ids, assignment_types, max(args.clients, workers * 2), 0.5, args.seed)
+                for op in ops:
+                    latencies, errors, elapsed = run_load(port, op, ids, assignment_types,
+                                                          args.clients, args.seconds, args.seed)
+                    results.append(summarize(workers, op, latencies, errors, elapsed))
+            finally:
+                server.terminate()
+                server.wait()
+
+    print_results(results)
+
+    if args.output:
+        report = {
+            "meta": {
+                "submissions": args.submissions,
+                "clients": args.clients,
+                "seconds": args.seconds,
+                "mode": args.mode,
+                "cores": cores,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "recorded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
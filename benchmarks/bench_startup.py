@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the serverless function in api/grade.py.
+
+Every run is a fresh interpreter that imports grade and answers a single
+request in-process, as a new serverless instance would. Three times are
+recorded for each run. import_ms is the time to import grade.
+first_response_ms is the time from then until the response is written,
+and ready_ms is the two together.
+process_ms is the whole process, interpreter startup included, as seen
+from the parent. Medians over --runs are reported for each request.
+
+    python benchmarks/bench_startup.py --runs 30 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+
+Set GRADE_STORE=sqlite (and GRADE_DB_PATH) to measure the SQLite store.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+
+# (method, path): a CORS preflight, which needs no data, then reads
+REQUESTS = (
+    ('OPTIONS', '/api/submissions'),
+    ('GET', '/api/submissions'),
+    ('GET', '/api/submissions/sub_001'),
+)
+
+# Run in the fresh interpreter. It imports as little as possible before
+# timing so that grade pays for its own imports, as on a cold instance.
+CHILD = """
+import io, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import grade
+imported = time.perf_counter()
+
+raw = f"{sys.argv[2]} {sys.argv[3]} HTTP/1.1\\r\\nHost: bench\\r\\nContent-Length: 0\\r\\n\\r\\n".encode()
+h = grade.handler.__new__(grade.handler)
+h.rfile = io.BytesIO(raw)
+h.wfile = io.BytesIO()
+h.client_address = ('127.0.0.1', 0)
+h.server = None
+h.request = None
+h.close_connection = True
+h.handle_one_request()
+done = time.perf_counter()
+print(imported - start, done - imported, h.wfile.getvalue().split(b' ', 2)[1].decode())
+"""
+
+
+def run_once(method, path):
+    env = dict(os.environ, GRADE_ACCESS_LOG='0')
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, API_DIR, method, path],
+        check=True, capture_output=True, text=True, env=env,
+    ).stdout
+    process = time.perf_counter() - start
+    import_s, response_s, status = output.split()
+    return float(import_s), float(response_s), process, int(status)
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def measure(method, path, runs):
+    samples = [run_once(method, path) for _ in range(runs)]
+    return {
+        "method": method,
+        "path": path,
+        "runs": runs,
+        "errors": sum(1 for sample in samples if sample[3] >= 300),
+        "import_ms": round(median([s[0] for s in samples]) * 1000, 2),
+        "first_response_ms": round(median([s[1] for s in samples]) * 1000, 2),
+        "ready_ms": round(median([s[0] + s[1] for s in samples]) * 1000, 2),
+        "process_ms": round(median([s[2] for s in samples]) * 1000, 2),
+    }
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r['method'], r['path']): r for r in baseline['results']}
+    header = (f"{'request':<36}{'import ms':>11}{'response ms':>13}{'ready ms':>10}"
+              f"{'process ms':>12}{'errors':>8}")
+    if previous:
+        header += f"{'vs base':>9}"
+    print(header)
+    for r in results:
+        line = (f"{r['method'] + ' ' + r['path']:<36}{r['import_ms']:>11.2f}{r['first_response_ms']:>13.2f}"
+                f"{r['ready_ms']:>10.2f}{r['process_ms']:>12.2f}{r['errors']:>8}")
+        base = previous.get((r['method'], r['path']))
+        if base:
+            # Below 1.00x is faster than the baseline
+            line += f"{r['ready_ms'] / base['ready_ms']:>8.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help="fresh processes per request (default: 20)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare import-to-first-response time against a previous --output file")
+    args = parser.parse_args()
+
+    results = [measure(method, path, args.runs) for method, path in REQUESTS]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "runs": args.runs,
+                "store": os.environ.get('GRADE_STORE', 'memory'),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "recorded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Synthetic submission rosters for benchmarks.
+
+Builds submissions shaped like STUDENT_SUBMISSIONS across every assignment
+type in RUBRICS. duplicate_rate is the share of answers drawn from a small
+pool of common answers per question (the answers in STUDENT_SUBMISSIONS
+plus a few variants, re-cased and re-spaced the way students type them);
+the rest are unique. The same arguments always produce the same roster.
+
+    python benchmarks/roster.py 100000 --duplicate-rate 0.5 > roster.ndjson
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from grade import RUBRICS, STUDENT_SUBMISSIONS
+
+FIRST_NAMES = ("Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace", "Henry", "Iris", "James",
+               "Kira", "Liam", "Maya", "Noah", "Olivia", "Priya", "Quinn", "Ravi", "Sofia", "Tomas")
+LAST_NAMES = ("Johnson", "Smith", "Davis", "Wilson", "Rodriguez", "Chen", "Kim", "Brown", "Patel",
+              "Nguyen", "Garcia", "Okafor", "Muller", "Rossi", "Tanaka", "Silva", "Cohen", "Ali")
+FILE_PREFIXES = {"calculus_homework": "calculus_hw1", "math_homework": "math_hw1", "essay": "essay1"}
+GENERIC_ANSWERS = ("See attached work", "I am not sure how to approach this",
+                   "The answer follows from the definition", "Shown step by step on page 2")
+START = datetime(2024, 1, 15, 8, 0, tzinfo=timezone.utc)
+POOL_SIZE = 6
+
+
+def answer_pools(rubrics=RUBRICS, submissions=STUDENT_SUBMISSIONS):
+    """Common answers for each (assignment type, question id)"""
+    pools = {}
+    for submission in submissions:
+        for question in submission['questions']:
+            pool = pools.setdefault((submission['assignment_type'], question['id']), [])
+            if question['student_answer'] not in pool:
+                pool.append(question['student_answer'])
+    for assignment_type, rubric in rubrics.items():
+        for question in rubric['questions']:
+            pool = pools.setdefault((assignment_type, question['id']), [])
+            for answer in GENERIC_ANSWERS:
+                if len(pool) >= POOL_SIZE:
+                    break
+                pool.append(answer)
+    return pools
+
+
+def _variant(rng, answer):
+    """The same answer as a student might retype it"""
+    roll = rng.random()
+    if roll < 0.2:
+        return answer.lower()
+    if roll < 0.3:
+        return f"  {answer} "
+    if roll < 0.4:
+        return answer.replace(' ', '  ')
+    return answer
+
+
+def generate_roster(count, duplicate_rate=0.3, seed=0, rubrics=RUBRICS):
+    """Yield `count` synthetic submissions"""
+    rng = random.Random(seed)
+    pools = answer_pools(rubrics)
+    assignment_types = sorted(rubrics)
+    for i in range(count):
+        assignment_type = assignment_types[i % len(assignment_types)]
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        student_id = f"{first[0]}{last[0]}{i:07d}"
+        questions = []
+        for question in rubrics[assignment_type]['questions']:
+            if rng.random() < duplicate_rate:
+                answer = _variant(rng, rng.choice(pools[(assignment_type, question['id'])]))
+            else:
+                answer = f"{rng.choice(pools[(assignment_type, question['id'])])} [{student_id}-{question['id']}]"
+            questions.append({
+                "id": question['id'],
+                "description": question['description'],
+                "max_points": question['max_points'],
+                "student_answer": answer,
+            })
+        yield {
+            "id": f"sub_{i:07d}",
+            "student_name": f"{first} {last}",
+            "student_id": student_id,
+            "filename": f"{FILE_PREFIXES.get(assignment_type, assignment_type)}_{first.lower()}_{i}.pdf",
+            "assignment_type": assignment_type,
+            "submitted_at": (START + timedelta(seconds=37 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "status": "pending_grading",
+            "questions": questions,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('count', type=int, help="number of submissions")
+    parser.add_argument('--duplicate-rate', type=float, default=0.3,
+                        help="share of answers taken from the common-answer pool (default: 0.3)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    out = sys.stdout
+    for submission in generate_roster(args.count, args.duplicate_rate, args.seed):
+        out.write(json.dumps(submission))
+        out.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,141 +4,142 @@ Local development server for AI-Assisted Grading Platform
 This simulates the Vercel serverless functions locally
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import json
-import random
-from urllib.parse import urlparse, parse_qs
+from http.server import HTTPServer, ThreadingHTTPServer
+import argparse
+import os
+import signal
+import socket
 import sys
+import traceback
+
+from async_server import run_async_server
 
 # Import the API logic from our serverless function
 sys.path.append('./api')
-from grade import RUBRICS, STUDENT_SUBMISSIONS, simulate_ai_grading
+from grade import handler
 
-class LocalAPIHandler(BaseHTTPRequestHandler):
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.end_headers()
-    
-    def do_GET(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.strip('/').split('/')
-        
-        if path_parts[0] == 'api':
-            if len(path_parts) == 2 and path_parts[1] == 'submissions':
-                # GET /api/submissions
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps(STUDENT_SUBMISSIONS).encode())
-                return
-            elif len(path_parts) == 3 and path_parts[1] == 'submissions':
-                # GET /api/submissions/{id}
-                submission_id = path_parts[2]
-                submission = next((s for s in STUDENT_SUBMISSIONS if s['id'] == submission_id), None)
-                if submission:
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(submission).encode())
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Submission not found"}).encode())
-                return
-        
-        self.send_response(404)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps({"error": "Not found"}).encode())
-    
-    def do_POST(self):
-        parsed_path = urlparse(self.path)
-        path_parts = parsed_path.path.strip('/').split('/')
-        
-        if path_parts[0] == 'api':
-            if len(path_parts) == 4 and path_parts[1] == 'submissions' and path_parts[3] == 'grade':
-                # POST /api/submissions/{id}/grade
-                submission_id = path_parts[2]
-                submission = next((s for s in STUDENT_SUBMISSIONS if s['id'] == submission_id), None)
-                
-                if submission:
-                    result = simulate_ai_grading(submission['assignment_type'], submission['questions'])
-                    result['submission_id'] = submission_id
-                    result['student_name'] = submission['student_name']
-                    result['filename'] = submission['filename']
-                    result['assignment_type'] = submission['assignment_type']
-                    
-                    # Update submission status and store grading results
-                    submission['status'] = 'graded'
-                    submission['total_score'] = result['total_score']
-                    submission['max_total'] = result['max_total']
-                    submission['percentage'] = result['percentage']
-                    submission['graded_at'] = result.get('graded_at', '2024-01-16T14:20:00Z')
-                    
-                    # Update questions with scores and feedback
-                    for i, question in enumerate(submission['questions']):
-                        if i < len(result['questions']):
-                            graded_q = result['questions'][i]
-                            question['score'] = graded_q['score']
-                            question['feedback'] = graded_q['feedback']
-                    
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(result).encode())
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Submission not found"}).encode())
-                return
-            elif len(path_parts) == 4 and path_parts[1] == 'submissions' and path_parts[3] == 'release':
-                # POST /api/submissions/{id}/release
-                submission_id = path_parts[2]
-                submission = next((s for s in STUDENT_SUBMISSIONS if s['id'] == submission_id), None)
-                
-                if submission:
-                    submission['status'] = 'released'
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"message": "Grades released successfully"}).encode())
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Submission not found"}).encode())
-                return
-        
-        self.send_response(404)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps({"error": "Not found"}).encode())
+class LocalAPIHandler(handler):
+    """Serves the same routes as the Vercel function"""
 
-def run_server(port=5001):
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, LocalAPIHandler)
-    print(f"🚀 Local API server running on http://localhost:{port}")
-    print(f"📡 API endpoints available at http://localhost:{port}/api/")
-    print("Press Ctrl+C to stop the server")
+def reuse_port(server_class):
+    """server_class bound with SO_REUSEPORT, so several processes can listen on one port"""
+    class ReusePortServer(server_class):
+        def server_bind(self):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            super().server_bind()
+    return ReusePortServer
+
+def serve(port=5001, mode='async', max_connections=256, concurrency=32, shared_port=False, max_streams=64):
+    """Serve the API in this process until interrupted"""
+    if mode == 'async':
+        run_async_server(LocalAPIHandler, port=port, max_connections=max_connections,
+                         concurrency=concurrency, reuse_port=shared_port, max_streams=max_streams)
+        return
+
+    server_class = ThreadingHTTPServer if mode == 'threaded' else HTTPServer
+    if shared_port:
+        server_class = reuse_port(server_class)
+    httpd = server_class(('', port), LocalAPIHandler)
     try:
         httpd.serve_forever()
+    finally:
+        httpd.server_close()
+
+def run_prefork(workers, port=5001, **options):
+    """Serve from `workers` forked processes, each accepting connections on
+    its own SO_REUSEPORT socket so the kernel spreads them across cores.
+
+    Workers share submissions through the SQLite store in shared mode
+    (GRADE_STORE=sqlite, GRADE_DB_SHARED=1), so a grade or release made
+    by one worker is seen by the rest. Response caches, grading caches,
+    jobs and metrics stay per worker. Each worker builds its API after the
+    fork, so no database connection is shared between processes.
+    """
+    if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+        raise SystemExit("--workers needs fork() and SO_REUSEPORT (Linux, macOS or BSD)")
+    if os.environ.setdefault('GRADE_STORE', 'sqlite') != 'sqlite':
+        raise SystemExit("--workers needs GRADE_STORE=sqlite so that workers share submissions")
+    os.environ['GRADE_DB_SHARED'] = '1'
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                serve(port, shared_port=True, **options)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        pids.append(pid)
+
+    # Stop the workers too when the parent is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+def run_server(port=5001, mode='async', max_connections=256, concurrency=32, access_log=True, workers=1,
+               job_timeout=None, max_streams=64):
+    """Serve the API locally.
+
+    mode 'async' (default) uses the asyncio HTTP/1.1 server with keep-alive;
+    'threaded' and 'single' fall back to http.server with a thread per
+    request or one request at a time. access_log=False drops the stderr
+    line written for every request. workers > 1 forks that many server
+    processes sharing the port and a SQLite database (see run_prefork).
+    job_timeout overrides GRADING_JOB_TIMEOUT, the seconds a background
+    grading job may run. In async mode max_streams caps the event streams
+    followed at once, which don't count against concurrency.
+    """
+    LocalAPIHandler.access_log = access_log
+    if job_timeout is not None:
+        # Read when the API is built on the first request
+        os.environ['GRADING_JOB_TIMEOUT'] = str(job_timeout)
+    processes = f", {workers} workers" if workers > 1 else ""
+    print(f"🚀 Local API server running on http://localhost:{port} ({mode}{processes})")
+    print(f"📡 API endpoints available at http://localhost:{port}/api/")
+    print("Press Ctrl+C to stop the server", flush=True)
+
+    try:
+        if workers > 1:
+            run_prefork(workers, port, mode=mode, max_connections=max_connections, concurrency=concurrency,
+                        max_streams=max_streams)
+        else:
+            serve(port, mode, max_connections, concurrency, max_streams=max_streams)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped")
-        httpd.shutdown()
 
 if __name__ == '__main__':
-    run_server()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--mode', choices=['async', 'threaded', 'single'], default='async',
+                        help="server implementation (default: async)")
+    parser.add_argument('--max-connections', type=int, default=256,
+                        help="async mode: open connections before new ones get 503")
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help="async mode: requests handled at once")
+    parser.add_argument('--max-streams', type=int, default=64,
+                        help="async mode: Server-Sent Events streams (Accept: text/event-stream) served at once, "
+                             "apart from --concurrency")
+    parser.add_argument('--no-access-log', dest='access_log', action='store_false',
+                        help="don't log every request to stderr")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="server processes sharing the port; more than 1 needs GRADE_STORE=sqlite "
+                             "(the default then)")
+    parser.add_argument('--job-timeout', type=float,
+                        help="seconds a background grading job may run (default: GRADING_JOB_TIMEOUT or 300)")
+    args = parser.parse_args()
+    run_server(args.port, args.mode, args.max_connections, args.concurrency, args.access_log, args.workers,
+               args.job_timeout, args.max_streams)
@@ -0,0 +1,67 @@
+"""
+Several processes writing one SQLite database in shared mode, as the
+local_server.py prefork workers do, must each end up seeing every
+submission the others committed.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _sqlite_store import SQLiteSubmissionStore
+import _dataset
+
+WORKERS = 3
+ADDS = 300
+
+
+def worker(path, index, barrier, results):
+    store = SQLiteSubmissionStore(path, shared=True)
+    try:
+        template = _dataset.submissions()[0]
+        for i in range(ADDS):
+            store.add(dict(template, id=f'w{index}_{i}', status='pending_grading'))
+            # Updates to the seeded submissions race with the other workers'
+            store.set_status(f'sub_00{1 + i % 8}', f'w{index}_{i}')
+        barrier.wait()
+        statuses = {submission.id: submission.status for submission in store.all()}
+        results.put((index, statuses))
+    finally:
+        store.close()
+
+
+class SharedStoreTest(unittest.TestCase):
+    def test_workers_see_every_commit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'grading.db')
+            seed = SQLiteSubmissionStore(path, seed=_dataset.submissions())
+            len(seed)
+            seed.close()
+
+            context = multiprocessing.get_context('fork')
+            barrier = context.Barrier(WORKERS)
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(path, i, barrier, results)) for i in range(WORKERS)]
+            for process in processes:
+                process.start()
+            seen = dict(results.get(timeout=120) for _ in processes)
+            for process in processes:
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+
+            db = sqlite3.connect(path)
+            committed = {submission_id: json.loads(data)['status']
+                         for submission_id, data in db.execute("SELECT id, data FROM submissions")}
+            db.close()
+            self.assertEqual(len(committed), len(_dataset.submissions()) + WORKERS * ADDS)
+            for index in range(WORKERS):
+                self.assertEqual(seen[index], committed, f"worker {index} is out of date")
+
+
+if __name__ == '__main__':
+    unittest.main()